@@ -1,21 +1,9 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+# Kept for the old entry point; the versioned migrations live in migrations.py
+import sys
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///workouts.db'
-db = SQLAlchemy(app)
-
-def upgrade_db():
-    with app.app_context():
-        # Add start_time column with default value
-        db.engine.execute('ALTER TABLE workout ADD COLUMN start_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP')
-        # Add duration column
-        db.engine.execute('ALTER TABLE workout ADD COLUMN duration INTEGER')
-        
-        # Update existing workouts to use their date as start_time
-        db.engine.execute('UPDATE workout SET start_time = date WHERE start_time IS NULL')
+from migrations import DEFAULT_DB_PATH, upgrade
 
 if __name__ == '__main__':
-    upgrade_db()
-    print("Database upgrade completed successfully!")
\ No newline at end of file
+    applied = upgrade(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH)
+    print(f"Applied {len(applied)} migration(s): {', '.join(applied) or 'none'}")
+    print("Database upgrade completed successfully!")
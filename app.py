@@ -5,9 +5,14 @@ from flask import (
     redirect, url_for, 
     flash,  
     get_flashed_messages, 
-    session
+    session,
+    g,
+    has_request_context,
+    Response,
+    stream_with_context
 )
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
 from flask_login import (
     LoginManager,
     UserMixin,
@@ -20,18 +25,106 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 from pytz import timezone
 from waitress import serve
-
+from sqlalchemy import and_, bindparam, case, create_engine, event, func, insert, inspect, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, joinedload, object_session, selectinload
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.sql.util import find_tables
+from migrations import upgrade as upgrade_schema
+
+import numpy as np
+
+import bisect
+import click
+import codecs
+import collections
+import contextlib
+import contextvars
+import functools
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
 import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///workouts.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///workouts.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = 'your-secret-key-here'  # Replace with a secure secret key
-db = SQLAlchemy(app)
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')  # Replace with a secure secret key
+
+# Production server (waitress) and SQLite tuning, overridable from the environment
+app.config['SERVER_HOST'] = os.environ.get('SERVER_HOST', '0.0.0.0')
+app.config['SERVER_PORT'] = int(os.environ.get('SERVER_PORT', 8080))
+app.config['SERVER_THREADS'] = int(os.environ.get('SERVER_THREADS', 8))
+app.config['SERVER_CONNECTION_LIMIT'] = int(os.environ.get('SERVER_CONNECTION_LIMIT', 100))
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+if ':memory:' not in app.config['SQLALCHEMY_DATABASE_URI']:
+    # One pooled connection per waitress thread, plus a little headroom
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': app.config['SERVER_THREADS'],
+        'max_overflow': 4,
+        'pool_timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+        'connect_args': {'timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}
+    }
+# Workout data sharding: '' keeps everything in one database, 'user' gives every
+# user their own SQLite file and a number N hash-partitions users over N files
+app.config['SHARDS'] = os.environ.get('SHARDS', '')
+app.config['SHARD_DIR'] = os.environ.get('SHARD_DIR', os.path.join(app.instance_path, 'shards'))
+# Seconds between reads of the shared exercise catalog version, for changes other processes commit
+app.config['CATALOG_VERSION_TTL'] = float(os.environ.get('CATALOG_VERSION_TTL', 5))
+app.config['PAGE_CACHE_MAX_BYTES'] = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 0 disables
+# Opt-in per-request SQL profiling, reported in the log and at /_debug/perf
+app.config['SQL_PROFILING'] = os.environ.get('SQL_PROFILING', '') == '1'
+app.config['SQL_PROFILE_HISTORY'] = int(os.environ.get('SQL_PROFILE_HISTORY', 200))
+app.config['N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))
+app.config['ANALYTICS_DIR'] = os.environ.get('ANALYTICS_DIR', os.path.join(app.instance_path, 'analytics'))
+# Background jobs: worker threads started with the server (0 runs jobs inline), retried with backoff
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+app.config['JOB_RETRY_BASE_SECONDS'] = float(os.environ.get('JOB_RETRY_BASE_SECONDS', 5))
+app.config['JOB_RETRY_MAX_SECONDS'] = float(os.environ.get('JOB_RETRY_MAX_SECONDS', 600))
+app.config['JOB_POLL_SECONDS'] = float(os.environ.get('JOB_POLL_SECONDS', 1))
+
+class ShardedSession(FlaskSQLAlchemySession):
+    """Session that sends statements touching per-user tables to the user's shard."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and shard_router.enabled and shard_router.routes(mapper, clause):
+            return shard_router.engine_for(shard_router.current_user_id())
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(app, session_options={'class_': ShardedSession})
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 cstnow = lambda: datetime.now(timezone('America/Chicago'))
 
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer, and the busy timeout
+    # makes writers wait for the lock instead of failing with "database is locked"
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+    cursor.execute(f"PRAGMA cache_size=-{app.config['SQLITE_CACHE_SIZE_KB']}")
+    cursor.execute(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE']}")
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    # Off by default in SQLite; the ON DELETE CASCADE / SET NULL clauses rely on it
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
 # ----------------------- Models -----------------------
 
 # User Model
@@ -40,6 +133,13 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128))
+    # Profile counters, kept up to date by finish_workout(); NULL until first computed
+    completed_workouts = db.Column(db.Integer, default=0)
+    recent_workout_dates = db.Column(db.Text, default='[]')  # JSON dates of the last 7 days
+    current_streak = db.Column(db.Integer, default=0)  # Consecutive ISO weeks with a workout
+    longest_streak = db.Column(db.Integer, default=0)
+    last_workout_date = db.Column(db.DateTime)
+    data_version = db.Column(db.Integer, nullable=False, default=0)  # Bumped by every commit writing the user's data
     folders = db.relationship('Folder', backref='user', lazy=True)
     workouts = db.relationship('Workout', backref='user', lazy=True)
 
@@ -54,19 +154,26 @@ class Folder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    templates = db.relationship('WorkoutTemplate', backref='folder', lazy=True)
+    templates = db.relationship('WorkoutTemplate', backref='folder', lazy=True,
+                                cascade='all, delete-orphan', passive_deletes=True)
+    __table_args__ = (
+        db.Index('ix_folder_user_id', 'user_id'),
+    )
 
 # Workout Template Model
 class WorkoutTemplate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    folder_id = db.Column(db.Integer, db.ForeignKey('folder.id'), nullable=False)
-    exercises = db.relationship('TemplateExercise', backref='template', lazy=True)
+    folder_id = db.Column(db.Integer, db.ForeignKey('folder.id', ondelete='CASCADE'), nullable=False)
+    # Random token renewed by every edit to the exercises; cached start plans must match it
+    revision = db.Column(db.String(32), default=lambda: uuid.uuid4().hex)
+    exercises = db.relationship('TemplateExercise', backref='template', lazy=True,
+                                cascade='all, delete-orphan', passive_deletes=True)
 
 # Template Exercise Model
 class TemplateExercise(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'), nullable=False)
+    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id', ondelete='CASCADE'), nullable=False)
     exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
     sets = db.Column(db.Integer, nullable=False)
     reps = db.Column(db.String(50), nullable=True)
@@ -80,18 +187,25 @@ class TemplateExercise(db.Model):
 class Workout(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'))
+    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id', ondelete='SET NULL'))
     date = db.Column(db.DateTime, nullable=False, default=cstnow())
     name = db.Column(db.String(100))
     notes = db.Column(db.String(500))
     completed = db.Column(db.Boolean, default=False)
+    start_time = db.Column(db.DateTime)
     end_time = db.Column(db.DateTime)  # Add this line
-    sets = db.relationship('WorkoutSet', backref='workout', lazy=True)
+    duration = db.Column(db.Integer)  # Seconds between start_time and end_time
+    sets = db.relationship('WorkoutSet', backref='workout', lazy=True, order_by='WorkoutSet.id',
+                           cascade='all, delete-orphan', passive_deletes=True)
+    template = db.relationship('WorkoutTemplate')
+    __table_args__ = (
+        db.Index('ix_workout_user_completed_date', 'user_id', 'completed', 'date'),
+    )
 
 # Workout Set Model
 class WorkoutSet(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    workout_id = db.Column(db.Integer, db.ForeignKey('workout.id'), nullable=False)
+    workout_id = db.Column(db.Integer, db.ForeignKey('workout.id', ondelete='CASCADE'), nullable=False)
     exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
     weight = db.Column(db.Float)
     reps = db.Column(db.Integer)   
@@ -99,7 +213,12 @@ class WorkoutSet(db.Model):
     rir = db.Column(db.Integer)    
     notes = db.Column(db.String(200))
     completed = db.Column(db.Boolean, default=False)
+    client_seq = db.Column(db.BigInteger)  # Highest autosave sequence number applied
     exercise = db.relationship('Exercise', backref='sets')
+    __table_args__ = (
+        db.Index('ix_workout_set_workout_exercise', 'workout_id', 'exercise_id'),
+        db.Index('ix_workout_set_exercise_completed', 'exercise_id', 'completed'),
+    )
 
 # Exercise Model
 class Exercise(db.Model):
@@ -116,6 +235,412 @@ class Exercise(db.Model):
             'equipment': self.equipment
         }
 
+# Catalog Version Model (one row, bumped by every commit that changes exercises, see Exercise Catalog)
+class CatalogVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# Exercise Progress Model (best set per exercise per completed workout, backs /stats)
+class ExerciseProgress(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
+    workout_id = db.Column(db.Integer, db.ForeignKey('workout.id', ondelete='CASCADE'), nullable=False)
+    date = db.Column(db.DateTime, nullable=False)
+    one_rm = db.Column(db.Float, nullable=False)
+    weight = db.Column(db.Float, nullable=False)
+    reps = db.Column(db.Integer, nullable=False)
+    rpe = db.Column(db.Float)
+    __table_args__ = (
+        db.UniqueConstraint('workout_id', 'exercise_id'),
+        db.Index('ix_exercise_progress_user_exercise_date', 'user_id', 'exercise_id', 'date'),
+    )
+
+# Weekly Volume Model (per user, ISO week and muscle category, backs /trends)
+class WeeklyVolume(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    week_start = db.Column(db.Date, nullable=False)  # Monday of the ISO week
+    category = db.Column(db.String(50), nullable=False)
+    workouts = db.Column(db.Integer, nullable=False)
+    sets = db.Column(db.Integer, nullable=False)
+    hard_sets = db.Column(db.Integer, nullable=False)
+    tonnage = db.Column(db.Float, nullable=False)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'week_start', 'category'),
+    )
+
+# Personal Record Model (per user and exercise, backs the PR flags in view_workout)
+class PersonalRecord(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
+    # Each record keeps the workout that set it; ties stay with the earlier workout
+    best_e1rm = db.Column(db.Float)
+    best_e1rm_workout_id = db.Column(db.Integer)
+    max_weight = db.Column(db.Float)
+    max_weight_workout_id = db.Column(db.Integer)
+    best_volume = db.Column(db.Float)  # Most weight x reps for the exercise in one workout
+    best_volume_workout_id = db.Column(db.Integer)
+    rep_records = db.Column(db.Text, default='{}')  # JSON {"<weight>": [reps, workout_id]}
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'exercise_id'),
+    )
+
+# Background Job Model (durable queue for work deferred out of requests, see Job Queue)
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    key = db.Column(db.String(200), unique=True, nullable=False)  # Idempotency key; re-enqueueing reuses the row
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON arguments for the handler
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'))  # Shard the job runs against
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done or failed
+    generation = db.Column(db.Integer, nullable=False, default=0)  # Bumped on every enqueue of the key
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_after = db.Column(db.DateTime, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+
+# ----------------------- Sharding -----------------------
+
+# Per-user tables; User and Exercise stay in the shared catalog database
+SHARDED_TABLES = frozenset(model.__table__ for model in (
+    Folder, WorkoutTemplate, TemplateExercise, Workout, WorkoutSet, ExerciseProgress, WeeklyVolume,
+    PersonalRecord
+))
+SHARDED_TABLE_NAMES = frozenset(table.name for table in SHARDED_TABLES)
+
+class ShardRouter:
+    """Maps users to shard databases and lazily opens one engine per shard.
+
+    Every shard connection attaches the catalog database, so the shard's
+    tables still join against user and exercise with unqualified names.
+    """
+
+    def __init__(self, mode, shard_dir):
+        self.per_user = mode == 'user'
+        self.count = int(mode) if mode and not self.per_user else 0
+        self.enabled = self.per_user or self.count > 0
+        self.shard_dir = shard_dir
+        self._engines = {}
+        self._lock = threading.Lock()
+        self._user_override = contextvars.ContextVar('shard_user_id', default=None)
+
+    def shard_key(self, user_id):
+        if self.per_user:
+            return f'user_{user_id}'
+        return f'shard_{user_id % self.count}'
+
+    def routes(self, mapper, clause):
+        if mapper is not None and inspect(mapper).local_table in SHARDED_TABLES:
+            return True
+        if clause is None:
+            return False
+        return any(
+            getattr(table, 'name', None) in SHARDED_TABLE_NAMES
+            for table in find_tables(clause, check_columns=True, include_aliases=True,
+                                     include_joins=True, include_selects=True, include_crud=True)
+        )
+
+    @contextlib.contextmanager
+    def using(self, user_id):
+        """Route to user_id's shard outside a request (CLI commands, scripts)."""
+        token = self._user_override.set(user_id)
+        try:
+            yield
+        finally:
+            self._user_override.reset(token)
+
+    def current_user_id(self):
+        user_id = self._user_override.get()
+        if user_id is None and has_request_context():
+            # Read the id Flask-Login already has instead of calling the user
+            # loader, which would query from inside get_bind()
+            user = g.get('_login_user')
+            if user is not None and user.is_authenticated:
+                # The identity key never loads, even once a commit expired the user
+                user_id = inspect(user).identity[0]
+            else:
+                user_id = session.get('_user_id')
+        if user_id is None:
+            raise RuntimeError('No user to route sharded tables for; use shard_router.using(user_id).')
+        return int(user_id)
+
+    def current_key(self):
+        """Shard of the current user, or None when sharding is off."""
+        return self.shard_key(self.current_user_id()) if self.enabled else None
+
+    def engine_for(self, user_id):
+        key = self.shard_key(user_id)
+        engine = self._engines.get(key)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(key)
+                if engine is None:
+                    engine = self._engines[key] = self._open_shard(key)
+        return engine
+
+    def _open_shard(self, key):
+        os.makedirs(self.shard_dir, exist_ok=True)
+        path = os.path.join(self.shard_dir, f'{key}.db')
+        catalog_path = db.engine.url.database
+        engine = create_engine(f'sqlite:///{path}', **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+
+        @event.listens_for(engine, 'connect')
+        def attach_catalog(dbapi_connection, connection_record):
+            dbapi_connection.execute('ATTACH DATABASE ? AS catalog', (catalog_path,))
+
+        create_shard_schema(engine)
+        upgrade_schema(path)
+        return engine
+
+def create_shard_schema(engine):
+    """Create the per-user tables in a shard.
+
+    Foreign keys to user and exercise are left out because SQLite cannot
+    enforce constraints across attached databases.
+    """
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table not in SHARDED_TABLES or engine.dialect.has_table(conn, table.name, schema='main'):
+                continue
+            local_keys = [fk for fk in table.foreign_key_constraints if fk.referred_table in SHARDED_TABLES]
+            conn.execute(CreateTable(table, include_foreign_key_constraints=local_keys))
+            for index in table.indexes:
+                conn.execute(CreateIndex(index))
+
+shard_router = ShardRouter(app.config['SHARDS'], app.config['SHARD_DIR'])
+
+# ----------------------- Exercise Catalog -----------------------
+
+class ExerciseCatalog:
+    """In-process cache of the exercise table.
+
+    Holds the list sorted by category and name, a by-id map, a by-category
+    grouping and the serialized JSON served to browsers. Every transaction
+    that changes Exercise rows also bumps the catalog_version row, and this
+    process's own commits invalidate the cache at once. Changes committed
+    by other processes (CLI imports, other server workers) are noticed
+    through that row, read at most once per CATALOG_VERSION_TTL seconds.
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._stored_version = None
+        self._checked_at = None  # time.monotonic() of the last catalog_version read
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._checked_at = None
+
+    def _stored(self):
+        checked_at = self._checked_at
+        now = time.monotonic()
+        if checked_at is None or now - checked_at >= app.config['CATALOG_VERSION_TTL']:
+            self._stored_version = db.session.scalar(select(CatalogVersion.version).where(CatalogVersion.id == 1)) or 0
+            self._checked_at = now
+        return self._stored_version
+
+    def _current(self):
+        version = (self._version, self._stored())
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot['version'] == version:
+            return snapshot
+
+        exercises = [e.to_dict() for e in Exercise.query.order_by(Exercise.category, Exercise.name).all()]
+        by_category = {}
+        for exercise in exercises:
+            by_category.setdefault(exercise['category'], []).append(exercise)
+        body = json.dumps({'exercises': exercises}, separators=(',', ':')).encode()
+
+        snapshot = {
+            'version': version,
+            'exercises': exercises,
+            'by_id': {exercise['id']: exercise for exercise in exercises},
+            'by_category': by_category,
+            'json': body,
+            'search_index': ExerciseSearchIndex(exercises),
+            # Content hash, so every worker process hands out the same tag
+            'etag': hashlib.sha1(body).hexdigest()[:16]
+        }
+        self._snapshot = snapshot
+        return snapshot
+
+    @property
+    def exercises(self):
+        return self._current()['exercises']
+
+    @property
+    def by_id(self):
+        return self._current()['by_id']
+
+    @property
+    def by_category(self):
+        return self._current()['by_category']
+
+    @property
+    def json(self):
+        return self._current()['json']
+
+    @property
+    def etag(self):
+        return self._current()['etag']
+
+    @property
+    def search_index(self):
+        return self._current()['search_index']
+
+exercise_catalog = ExerciseCatalog()
+
+def normalize_exercise_name(text):
+    # Lowercase words only: "Bench Press (Barbell)" -> "bench press barbell"
+    return ' '.join(re.findall(r'[a-z0-9]+', (text or '').lower()))
+
+def name_trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class ExerciseSearchIndex:
+    """In-memory prefix and trigram index over the exercise catalog.
+
+    Query words are matched against the distinct words of exercise names:
+    by prefix with a binary search over the sorted vocabulary, and, for
+    words with no prefix match, by trigram overlap to tolerate typos. A
+    lookup touches only the posting lists of matching words, never the
+    whole catalog.
+    """
+
+    MIN_SIMILARITY = 0.3
+
+    def __init__(self, exercises):
+        self.exercises = exercises
+        self.names = [normalize_exercise_name(e['name']) for e in exercises]
+        # Alphabetical position of each name, used to break score ties cheaply
+        self.name_rank = [0] * len(self.names)
+        for rank, idx in enumerate(sorted(range(len(self.names)), key=self.names.__getitem__)):
+            self.name_rank[idx] = rank
+        postings = {}
+        for idx, name in enumerate(self.names):
+            for word in name.split():
+                postings.setdefault(word, set()).add(idx)
+        self.vocabulary = sorted(postings)
+        self.postings = postings
+        self.trigrams = {}
+        for word in self.vocabulary:
+            for gram in name_trigrams(word):
+                self.trigrams.setdefault(gram, []).append(word)
+
+    def _word_matches(self, query_word):
+        # Returns {vocabulary word: score}; prefixes score 1, typos their similarity
+        start = bisect.bisect_left(self.vocabulary, query_word)
+        matches = {}
+        for word in itertools.islice(self.vocabulary, start, None):
+            if not word.startswith(query_word):
+                break
+            matches[word] = 1.0
+        if matches:
+            return matches
+
+        grams = name_trigrams(query_word)
+        shared = collections.Counter()
+        for gram in grams:
+            shared.update(self.trigrams.get(gram, ()))
+        for word, count in shared.items():
+            similarity = count / (len(grams) + len(name_trigrams(word)) - count)
+            if similarity >= self.MIN_SIMILARITY:
+                matches[word] = similarity
+        return matches
+
+    def search(self, query, category=None, equipment=None, limit=20):
+        query = normalize_exercise_name(query)
+        category = (category or '').lower()
+        equipment = (equipment or '').lower()
+
+        def allowed(idx):
+            exercise = self.exercises[idx]
+            if category and exercise['category'].lower() != category:
+                return False
+            if equipment and equipment not in (exercise['equipment'] or '').lower().split('/'):
+                return False
+            return True
+
+        if not query:
+            scores = {idx: 0 for idx in range(len(self.exercises))}
+        else:
+            # Every query word has to match some word of the name
+            scores = None
+            for query_word in query.split():
+                word_scores = {}
+                for word, score in self._word_matches(query_word).items():
+                    for idx in self.postings[word]:
+                        if score > word_scores.get(idx, 0):
+                            word_scores[idx] = score
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {idx: scores[idx] + score for idx, score in word_scores.items() if idx in scores}
+                if not scores:
+                    return []
+
+            # Whole-name matches rank above word matches
+            for idx in scores:
+                if self.names[idx] == query:
+                    scores[idx] += 20
+                elif self.names[idx].startswith(query):
+                    scores[idx] += 10
+
+        candidates = (idx for idx in scores if allowed(idx)) if category or equipment else scores
+        name_rank = self.name_rank
+        ranked = heapq.nsmallest(limit, candidates, key=lambda idx: (-scores[idx], name_rank[idx]))
+        return [self.exercises[idx] for idx in ranked]
+
+@event.listens_for(Exercise, 'after_insert')
+@event.listens_for(Exercise, 'after_update')
+@event.listens_for(Exercise, 'after_delete')
+def mark_exercise_catalog_dirty(mapper, connection, target):
+    object_session(target).info['exercise_catalog_dirty'] = True
+
+@event.listens_for(Session, 'do_orm_execute')
+def mark_exercise_catalog_changed_by_statement(orm_execute_state):
+    # Bulk insert(Exercise) and Query.update()/delete() skip the mapper events
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        if orm_execute_state.bind_mapper is inspect(Exercise):
+            orm_execute_state.session.info['exercise_catalog_dirty'] = True
+
+@event.listens_for(Session, 'before_commit')
+def bump_catalog_version(session):
+    # Same transaction as the exercise change, so other processes never see one without the other
+    session.flush()
+    if session.info.get('exercise_catalog_dirty'):
+        catalog_version = CatalogVersion.__table__
+        stmt = sqlite_insert(catalog_version).values(id=1, version=1)
+        stmt = stmt.on_conflict_do_update(index_elements=[catalog_version.c.id],
+                                          set_={'version': catalog_version.c.version + 1})
+        session.connection(bind_arguments={'mapper': CatalogVersion}).execute(stmt)
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_exercise_catalog(session):
+    # Invalidate only once the change is visible to other connections
+    if session.info.pop('exercise_catalog_dirty', False):
+        exercise_catalog.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def discard_exercise_catalog_change(session):
+    session.info.pop('exercise_catalog_dirty', None)
+
+@app.context_processor
+def inject_exercise_catalog_url():
+    # Pages fetch the catalog from this versioned URL instead of embedding it
+    return {'exercise_catalog_url': lambda: url_for('exercise_catalog_json', v=exercise_catalog.etag)}
+
 # ----------------------- Login Manager -----------------------
 
 @login_manager.user_loader
@@ -126,6 +651,1910 @@ def load_user(user_id):
 def clear_flashes():
     session.pop('_flashes', None)
 
+# ----------------------- Stats Helpers -----------------------
+
+def calculate_e1rm(weight, reps, rpe=None):
+    # Calculate e1RM based on RPE when available
+    if rpe is not None:
+        return weight * (1 + reps/30) * (rpe/10)
+    return weight * (1 + reps/30)
+
+def qualifying_sets_query():
+    """Completed sets with a weight and reps from finished workouts."""
+    return db.session.query(
+            Workout.user_id,
+            WorkoutSet.exercise_id,
+            Workout.id,
+            Workout.date,
+            WorkoutSet.weight,
+            WorkoutSet.reps,
+            WorkoutSet.rpe
+        )\
+        .select_from(WorkoutSet)\
+        .join(Workout, WorkoutSet.workout_id == Workout.id)\
+        .filter(
+            Workout.completed == True,
+            WorkoutSet.completed == True,
+            WorkoutSet.weight.isnot(None),
+            WorkoutSet.reps.isnot(None)
+        )
+
+def iter_best_sets(rows):
+    """Reduce qualifying set rows to the best e1RM set per (exercise, workout).
+
+    Rows must be grouped by (exercise, workout) and ordered by set id inside
+    each group, as produced by qualifying_sets_query().
+    """
+    current_key = None
+    best = None
+    for user_id, exercise_id, workout_id, date, weight, reps, rpe in rows:
+        if (exercise_id, workout_id) != current_key:
+            if best and best['weight'] is not None:
+                yield best
+            current_key = (exercise_id, workout_id)
+            # Sets with a non-positive e1RM never qualify
+            best = {
+                'user_id': user_id,
+                'exercise_id': exercise_id,
+                'workout_id': workout_id,
+                'date': date,
+                'one_rm': 0,
+                'weight': None,
+                'reps': None,
+                'rpe': None
+            }
+
+        e1rm = calculate_e1rm(weight, reps, rpe)
+        if e1rm > best['one_rm']:
+            best.update(one_rm=e1rm, weight=weight, reps=reps, rpe=rpe)
+
+    if best and best['weight'] is not None:
+        yield best
+
+def refresh_exercise_progress(workout, exercise_ids=None):
+    """Recompute the stored best sets of one workout after its sets changed.
+
+    Only the given workout (optionally narrowed to some exercises) is
+    rescanned. The caller commits.
+    """
+    stale = ExerciseProgress.query.filter_by(workout_id=workout.id)
+    if exercise_ids is not None:
+        stale = stale.filter(ExerciseProgress.exercise_id.in_(exercise_ids))
+    stale.delete(synchronize_session=False)
+
+    if not workout.completed:
+        return
+
+    rows = qualifying_sets_query().filter(Workout.id == workout.id)
+    if exercise_ids is not None:
+        rows = rows.filter(WorkoutSet.exercise_id.in_(exercise_ids))
+    rows = rows.order_by(WorkoutSet.exercise_id, WorkoutSet.id).all()
+
+    best_sets = list(iter_best_sets(rows))
+    if best_sets:
+        db.session.execute(insert(ExerciseProgress), best_sets)
+
+def rebuild_exercise_progress(user_id=None):
+    """Backfill the progress table from raw sets, for one user or everyone."""
+    stale = ExerciseProgress.query
+    rows = qualifying_sets_query()
+    if user_id is not None:
+        stale = stale.filter_by(user_id=user_id)
+        rows = rows.filter(Workout.user_id == user_id)
+    stale.delete(synchronize_session=False)
+
+    rows = rows.order_by(WorkoutSet.exercise_id, Workout.id, WorkoutSet.id)
+    best_sets = list(iter_best_sets(rows.yield_per(1000)))
+    if best_sets:
+        db.session.execute(insert(ExerciseProgress), best_sets)
+    db.session.commit()
+    return len(best_sets)
+
+def stats_exercises(user_id):
+    """(id, name) of every exercise with progress rows, in exercise id order."""
+    exercise_ids = db.session.query(ExerciseProgress.exercise_id)\
+        .filter(ExerciseProgress.user_id == user_id)\
+        .distinct()\
+        .order_by(ExerciseProgress.exercise_id)
+    by_id = exercise_catalog.by_id
+    return [(exercise_id, by_id[exercise_id]['name']) for exercise_id, in exercise_ids if exercise_id in by_id]
+
+def compute_exercise_stats(user_id, after_exercise_id=None, limit=None):
+    """Build the per-exercise e1RM progression shown on the stats page.
+
+    Reads the precomputed best sets, so the cost is proportional to the
+    number of chart points rather than to the number of logged sets. Each
+    exercise is a set of parallel arrays (dates, e1rm, weight, reps, rpe).
+    Exercises are paged in id order after after_exercise_id; returns
+    (series, next_cursor), next_cursor being None on the last page.
+    """
+    exercises = stats_exercises(user_id)
+    if after_exercise_id is not None:
+        exercises = [(exercise_id, name) for exercise_id, name in exercises if exercise_id > after_exercise_id]
+    next_cursor = None
+    if limit is not None and len(exercises) > limit:
+        exercises = exercises[:limit]
+        next_cursor = exercises[-1][0]
+    if not exercises:
+        return [], None
+
+    series = {
+        exercise_id: {'id': exercise_id, 'name': name, 'dates': [], 'e1rm': [], 'weight': [], 'reps': [], 'rpe': []}
+        for exercise_id, name in exercises
+    }
+    rows = db.session.query(
+            ExerciseProgress.exercise_id,
+            ExerciseProgress.date,
+            ExerciseProgress.one_rm,
+            ExerciseProgress.weight,
+            ExerciseProgress.reps,
+            ExerciseProgress.rpe
+        )\
+        .filter(ExerciseProgress.user_id == user_id, ExerciseProgress.exercise_id.in_(list(series)))\
+        .order_by(ExerciseProgress.exercise_id, ExerciseProgress.date, ExerciseProgress.workout_id)
+    for exercise_id, date, one_rm, weight, reps, rpe in rows:
+        columns = series[exercise_id]
+        columns['dates'].append(date.strftime('%Y-%m-%d'))
+        columns['e1rm'].append(round(one_rm, 2))
+        columns['weight'].append(weight)
+        columns['reps'].append(reps)
+        columns['rpe'].append(rpe)
+    return list(series.values()), next_cursor
+
+STATS_SERIES_DEFAULT_POINTS = 200
+STATS_SERIES_MAX_POINTS = 2000
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of (x, y).
+
+    The first and last points are always kept. The rest are split into
+    threshold - 2 buckets, and from each the point forming the largest
+    triangle with the previously kept point and the next bucket's average
+    is chosen, so peaks and drops survive the downsampling.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+def compute_exercise_series(user_id, exercise_id, start=None, end=None, points=STATS_SERIES_DEFAULT_POINTS):
+    """One exercise's e1RM progression between start and end, downsampled to points.
+
+    Same best-set rows as compute_exercise_stats(), with the weight, reps
+    and RPE of each point kept alongside the e1RM LTTB picked it for.
+    """
+    query = db.session.query(
+            ExerciseProgress.date,
+            ExerciseProgress.one_rm,
+            ExerciseProgress.weight,
+            ExerciseProgress.reps,
+            ExerciseProgress.rpe
+        )\
+        .filter(ExerciseProgress.user_id == user_id, ExerciseProgress.exercise_id == exercise_id)
+    if start is not None:
+        query = query.filter(ExerciseProgress.date >= start)
+    if end is not None:
+        query = query.filter(ExerciseProgress.date < end)
+    rows = query.order_by(ExerciseProgress.date, ExerciseProgress.workout_id).all()
+
+    dates = np.array([date for date, *_ in rows], dtype='datetime64[s]')
+    e1rm = np.array([one_rm for _, one_rm, *_ in rows], dtype=np.float64)
+    keep = lttb_indices(dates.astype(np.float64), e1rm, points)
+    kept = [rows[i] for i in keep]
+    return {
+        'id': exercise_id,
+        'dates': [date.strftime('%Y-%m-%d') for date, *_ in kept],
+        'e1rm': [round(one_rm, 2) for _, one_rm, *_ in kept],
+        'weight': [weight for _, _, weight, _, _ in kept],
+        'reps': [reps for _, _, _, reps, _ in kept],
+        'rpe': [rpe for *_, rpe in kept],
+        'total_points': len(rows)
+    }
+
+# ----------------------- Rollup Helpers -----------------------
+
+# A set is hard at RPE >= 7 or RIR <= 3; sets logged with neither count as hard working sets
+HARD_SET_MIN_RPE = 7
+HARD_SET_MAX_RIR = 3
+TRENDS_DEFAULT_WEEKS = 52
+TRENDS_MAX_WEEKS = 520
+
+def iso_week_start(date):
+    """Monday of the ISO week containing date."""
+    return (date - timedelta(days=date.weekday())).date()
+
+def is_hard_set(rpe, rir):
+    if rpe is None and rir is None:
+        return True
+    return (rpe is not None and rpe >= HARD_SET_MIN_RPE) or (rir is not None and rir <= HARD_SET_MAX_RIR)
+
+def rollup_sets_query():
+    """Completed sets with reps from finished workouts, with their exercise category."""
+    return db.session.query(
+            Workout.user_id,
+            Workout.id,
+            Workout.date,
+            Exercise.category,
+            WorkoutSet.weight,
+            WorkoutSet.reps,
+            WorkoutSet.rpe,
+            WorkoutSet.rir
+        )\
+        .select_from(WorkoutSet)\
+        .join(Workout, WorkoutSet.workout_id == Workout.id)\
+        .join(Exercise, WorkoutSet.exercise_id == Exercise.id)\
+        .filter(
+            Workout.completed == True,
+            WorkoutSet.completed == True,
+            WorkoutSet.reps.isnot(None)
+        )
+
+def iter_weekly_volume(rows):
+    """Reduce rollup set rows to one WeeklyVolume row per (user, week, category).
+
+    Rows must be ordered by user, then workout date and id, as the rebuild
+    and refresh queries do, so only one week is held in memory at a time.
+    """
+    current_week = None
+    week_rows = {}
+    for user_id, workout_id, date, category, weight, reps, rpe, rir in rows:
+        week = (user_id, iso_week_start(date))
+        if week != current_week:
+            yield from week_rows.values()
+            current_week = week
+            week_rows = {}
+
+        entry = week_rows.get(category)
+        if entry is None:
+            entry = week_rows[category] = {
+                'user_id': user_id,
+                'week_start': week[1],
+                'category': category,
+                'workouts': 0,
+                'sets': 0,
+                'hard_sets': 0,
+                'tonnage': 0.0,
+                'last_workout_id': None
+            }
+        if entry['last_workout_id'] != workout_id:
+            entry['last_workout_id'] = workout_id
+            entry['workouts'] += 1
+        entry['sets'] += 1
+        entry['hard_sets'] += is_hard_set(rpe, rir)
+        entry['tonnage'] += (weight or 0) * reps
+    yield from week_rows.values()
+
+def insert_weekly_volume(rows):
+    week_rows = [
+        {key: value for key, value in row.items() if key != 'last_workout_id'}
+        for row in iter_weekly_volume(rows)
+    ]
+    if week_rows:
+        db.session.execute(insert(WeeklyVolume), week_rows)
+    return len(week_rows)
+
+def refresh_weekly_volume(workout):
+    """Recompute the rollup rows for the ISO week of one workout. The caller commits."""
+    week_start = iso_week_start(workout.date)
+    WeeklyVolume.query\
+        .filter_by(user_id=workout.user_id, week_start=week_start)\
+        .delete(synchronize_session=False)
+
+    start = datetime.combine(week_start, datetime.min.time())
+    rows = rollup_sets_query()\
+        .filter(
+            Workout.user_id == workout.user_id,
+            Workout.date >= start,
+            Workout.date < start + timedelta(days=7)
+        )\
+        .order_by(Workout.date, Workout.id)
+    insert_weekly_volume(rows)
+
+def rebuild_weekly_volume(user_id=None):
+    """Backfill the weekly rollups from raw sets, for one user or everyone."""
+    stale = WeeklyVolume.query
+    rows = rollup_sets_query()
+    if user_id is not None:
+        stale = stale.filter_by(user_id=user_id)
+        rows = rows.filter(Workout.user_id == user_id)
+    stale.delete(synchronize_session=False)
+
+    rows = rows.order_by(Workout.user_id, Workout.date, Workout.id)
+    count = insert_weekly_volume(rows.yield_per(1000))
+    db.session.commit()
+    return count
+
+def refresh_workout_aggregates(workout, exercise_ids=None):
+    """Update every table derived from a workout's sets after they changed. The caller commits."""
+    refresh_exercise_progress(workout, exercise_ids)
+    refresh_weekly_volume(workout)
+    refresh_personal_records(workout.user_id, workout.id, exercise_ids)
+
+def rebuild_workout_aggregates(user_id=None):
+    """Rebuild every table and analytics snapshot derived from logged sets. Returns the row count of each table."""
+    counts = {
+        'progress': rebuild_exercise_progress(user_id),
+        'weekly volume': rebuild_weekly_volume(user_id),
+        'user counter': rebuild_user_counters(user_id),
+        'personal record': rebuild_personal_records(user_id)
+    }
+    # Rebuilds for everyone run without a routed user, so pages are invalidated explicitly
+    bump_data_version(user_id)
+    db.session.commit()
+    user_ids = [user_id] if user_id is not None else db.session.scalars(select(User.id)).all()
+    for snapshot_user_id in user_ids:
+        build_analytics_snapshot(snapshot_user_id)
+    return counts
+
+def compute_weekly_trends(user_id, weeks=TRENDS_DEFAULT_WEEKS):
+    """Columnar weekly totals for the last `weeks` ISO weeks, oldest first.
+
+    A single range read on the (user_id, week_start, category) index; weeks
+    without training are filled with zeros so the series line up.
+    """
+    first_week = iso_week_start(cstnow().replace(tzinfo=None)) - timedelta(weeks=weeks - 1)
+    rows = WeeklyVolume.query\
+        .filter(WeeklyVolume.user_id == user_id, WeeklyVolume.week_start >= first_week)\
+        .order_by(WeeklyVolume.week_start, WeeklyVolume.category)\
+        .all()
+
+    week_index = {first_week + timedelta(weeks=i): i for i in range(weeks)}
+    trends = {
+        'weeks': [week.isoformat() for week in week_index],
+        'sets': [0] * weeks,
+        'hard_sets': [0] * weeks,
+        'tonnage': [0.0] * weeks,
+        'categories': {}
+    }
+    for row in rows:
+        i = week_index.get(row.week_start)
+        if i is None:
+            continue
+        trends['sets'][i] += row.sets
+        trends['hard_sets'][i] += row.hard_sets
+        trends['tonnage'][i] += row.tonnage
+        category = trends['categories'].setdefault(row.category, {
+            'sets': [0] * weeks,
+            'hard_sets': [0] * weeks,
+            'tonnage': [0.0] * weeks
+        })
+        category['sets'][i] = row.sets
+        category['hard_sets'][i] = row.hard_sets
+        category['tonnage'][i] = row.tonnage
+    return trends
+
+# ----------------------- Counter Helpers -----------------------
+
+RECENT_WORKOUT_DAYS = 7
+
+def compute_user_counters(dates, now):
+    """Profile counters from a user's completed workout dates, oldest first."""
+    counters = {
+        'completed_workouts': 0,
+        'current_streak': 0,
+        'longest_streak': 0,
+        'last_workout_date': None
+    }
+    recent = []
+    cutoff = now - timedelta(days=RECENT_WORKOUT_DAYS)
+    last_week = None
+    for date in dates:
+        counters['completed_workouts'] += 1
+        week = iso_week_start(date)
+        if last_week is None or week > last_week + timedelta(weeks=1):
+            counters['current_streak'] = 1
+        elif week == last_week + timedelta(weeks=1):
+            counters['current_streak'] += 1
+        last_week = week
+        counters['longest_streak'] = max(counters['longest_streak'], counters['current_streak'])
+        counters['last_workout_date'] = date
+        if date >= cutoff:
+            recent.append(date.isoformat())
+    counters['recent_workout_dates'] = json.dumps(recent)
+    return counters
+
+def completed_workout_dates_query():
+    return db.session.query(Workout.user_id, Workout.date)\
+        .filter(Workout.completed == True)\
+        .order_by(Workout.user_id, Workout.date)
+
+def refresh_user_counters(user):
+    """Recompute one user's counters from their workouts. The caller commits."""
+    rows = completed_workout_dates_query().filter(Workout.user_id == user.id)
+    counters = compute_user_counters((date for _, date in rows), cstnow().replace(tzinfo=None))
+    for field, value in counters.items():
+        setattr(user, field, value)
+
+def recent_workout_dates(user, now):
+    cutoff = now - timedelta(days=RECENT_WORKOUT_DAYS)
+    return [date for date in json.loads(user.recent_workout_dates or '[]') if datetime.fromisoformat(date) >= cutoff]
+
+def record_completed_workout(user, date):
+    """Fold one newly completed workout into the user's counters. The caller commits.
+
+    Workouts dated before the user's latest one change the streak history,
+    so those fall back to a full recompute.
+    """
+    if user.completed_workouts is None or (user.last_workout_date and date < user.last_workout_date):
+        refresh_user_counters(user)
+        return
+
+    now = cstnow().replace(tzinfo=None)
+    recent = recent_workout_dates(user, now)
+    if date >= now - timedelta(days=RECENT_WORKOUT_DAYS):
+        recent.append(date.isoformat())
+
+    week = iso_week_start(date)
+    last_week = iso_week_start(user.last_workout_date) if user.last_workout_date else None
+    if last_week is None or week > last_week + timedelta(weeks=1):
+        user.current_streak = 1
+    elif week == last_week + timedelta(weeks=1):
+        user.current_streak += 1
+
+    user.completed_workouts += 1
+    user.recent_workout_dates = json.dumps(recent)
+    user.longest_streak = max(user.longest_streak or 0, user.current_streak)
+    user.last_workout_date = date
+
+def rebuild_user_counters(user_id=None):
+    """Recompute the counters of one user or everyone from their workouts."""
+    users = User.query
+    if user_id is not None:
+        users = users.filter_by(id=user_id)
+    users = {user.id: user for user in users}
+
+    now = cstnow().replace(tzinfo=None)
+    rows = completed_workout_dates_query()
+    if user_id is not None:
+        rows = rows.filter(Workout.user_id == user_id)
+    computed = set()
+    for workout_user_id, rows_for_user in itertools.groupby(rows.yield_per(1000), key=lambda row: row.user_id):
+        user = users.get(workout_user_id)
+        if user is None:
+            continue
+        for field, value in compute_user_counters((date for _, date in rows_for_user), now).items():
+            setattr(user, field, value)
+        computed.add(workout_user_id)
+    for user in users.values():
+        if user.id not in computed:
+            for field, value in compute_user_counters((), now).items():
+                setattr(user, field, value)
+    db.session.commit()
+    return len(users)
+
+def profile_counters(user):
+    """Counters shown on /profile, read from the user row without aggregate queries."""
+    if user.completed_workouts is None:
+        # Row predates the counters; compute them once
+        refresh_user_counters(user)
+        db.session.commit()
+
+    now = cstnow().replace(tzinfo=None)
+    recent = recent_workout_dates(user, now)
+    # A streak stays current until a whole ISO week passes without a workout
+    current_streak = 0
+    if user.last_workout_date and iso_week_start(user.last_workout_date) >= iso_week_start(now) - timedelta(weeks=1):
+        current_streak = user.current_streak
+    return {
+        'total_workouts': user.completed_workouts,
+        'workouts_per_week': len(recent),
+        'current_streak': current_streak,
+        'longest_streak': user.longest_streak,
+        'last_workout_date': user.last_workout_date
+    }
+
+# ----------------------- Personal Record Helpers -----------------------
+
+PERSONAL_RECORD_FIELDS = (
+    'best_e1rm', 'best_e1rm_workout_id',
+    'max_weight', 'max_weight_workout_id',
+    'best_volume', 'best_volume_workout_id'
+)
+
+def personal_record_sets_query():
+    """Completed sets with a weight and reps, from finished and in-progress workouts alike."""
+    return db.session.query(
+            Workout.user_id,
+            WorkoutSet.exercise_id,
+            WorkoutSet.workout_id,
+            WorkoutSet.weight,
+            WorkoutSet.reps,
+            WorkoutSet.rpe
+        )\
+        .select_from(WorkoutSet)\
+        .join(Workout, WorkoutSet.workout_id == Workout.id)\
+        .filter(WorkoutSet.completed == True, WorkoutSet.weight.isnot(None), WorkoutSet.reps > 0)
+
+def rep_record_key(weight):
+    return f'{weight:g}'
+
+def fold_personal_records(record, rows):
+    """Raise record with (workout_id, weight, reps, rpe) rows of one exercise.
+
+    Only strictly better values replace a record, so rows must come oldest
+    first for ties to stay with the earlier workout.
+    """
+    volumes = {}
+    for workout_id, weight, reps, rpe in rows:
+        e1rm = calculate_e1rm(weight, reps, rpe)
+        if record['best_e1rm'] is None or e1rm > record['best_e1rm']:
+            record.update(best_e1rm=e1rm, best_e1rm_workout_id=workout_id)
+        if record['max_weight'] is None or weight > record['max_weight']:
+            record.update(max_weight=weight, max_weight_workout_id=workout_id)
+        key = rep_record_key(weight)
+        if key not in record['rep_records'] or reps > record['rep_records'][key][0]:
+            record['rep_records'][key] = [reps, workout_id]
+        volumes[workout_id] = volumes.get(workout_id, 0) + weight * reps
+    for workout_id, volume in volumes.items():
+        if record['best_volume'] is None or volume > record['best_volume']:
+            record.update(best_volume=volume, best_volume_workout_id=workout_id)
+    return record
+
+def empty_personal_record():
+    return dict.fromkeys(PERSONAL_RECORD_FIELDS, None) | {'rep_records': {}}
+
+def personal_record_values(record):
+    values = {field: getattr(record, field) for field in PERSONAL_RECORD_FIELDS}
+    values['rep_records'] = json.loads(record.rep_records or '{}')
+    return values
+
+def record_holders(values):
+    """Ids of the workouts holding any of the record's values."""
+    holders = {values['best_e1rm_workout_id'], values['max_weight_workout_id'], values['best_volume_workout_id']}
+    holders.update(workout_id for _, workout_id in values['rep_records'].values())
+    return holders
+
+def refresh_personal_records(user_id, workout_id, exercise_ids=None):
+    """Bring the user's records up to date after sets of one workout changed.
+
+    A record the workout does not hold can only be raised by it, so it is
+    merged with that workout's sets alone. A record it holds may have
+    dropped (an edited, uncompleted or deleted set), and is recomputed from
+    every set of the exercise, and removed if none are left. All of it is
+    read in one query; the caller commits.
+    """
+    if exercise_ids is None:
+        exercise_ids = [exercise_id for exercise_id, in db.session.query(WorkoutSet.exercise_id)
+                        .filter(WorkoutSet.workout_id == workout_id).distinct()]
+    exercise_ids = set(exercise_ids)
+    if not exercise_ids:
+        return
+
+    stored = {
+        record.exercise_id: record
+        for record in PersonalRecord.query.filter(
+            PersonalRecord.user_id == user_id,
+            PersonalRecord.exercise_id.in_(exercise_ids)
+        )
+    }
+    values = {exercise_id: personal_record_values(record) for exercise_id, record in stored.items()}
+    rescan = {exercise_id for exercise_id in exercise_ids
+              if exercise_id not in values or workout_id in record_holders(values[exercise_id])}
+    merge = exercise_ids - rescan
+
+    conditions = []
+    if merge:
+        conditions.append(and_(WorkoutSet.workout_id == workout_id, WorkoutSet.exercise_id.in_(merge)))
+    if rescan:
+        conditions.append(WorkoutSet.exercise_id.in_(rescan))
+    rows = personal_record_sets_query()\
+        .filter(Workout.user_id == user_id, or_(*conditions))\
+        .order_by(Workout.date, Workout.id, WorkoutSet.id)
+    rows_by_exercise = collections.defaultdict(list)
+    for _, exercise_id, set_workout_id, weight, reps, rpe in rows:
+        rows_by_exercise[exercise_id].append((set_workout_id, weight, reps, rpe))
+
+    for exercise_id in exercise_ids:
+        start = empty_personal_record() if exercise_id in rescan else values[exercise_id]
+        record_values = fold_personal_records(start, rows_by_exercise[exercise_id])
+        record = stored.get(exercise_id)
+        if record_values['max_weight'] is None:
+            # No qualifying sets left, as after a rebuild
+            if record is not None:
+                db.session.delete(record)
+            continue
+        if record is None:
+            record = PersonalRecord(user_id=user_id, exercise_id=exercise_id)
+            db.session.add(record)
+        for field in PERSONAL_RECORD_FIELDS:
+            setattr(record, field, record_values[field])
+        record.rep_records = json.dumps(record_values['rep_records'])
+
+def rebuild_personal_records(user_id=None):
+    """Backfill the personal record table from raw sets, for one user or everyone."""
+    stale = PersonalRecord.query
+    rows = personal_record_sets_query()
+    if user_id is not None:
+        stale = stale.filter_by(user_id=user_id)
+        rows = rows.filter(Workout.user_id == user_id)
+    stale.delete(synchronize_session=False)
+
+    rows = rows.order_by(Workout.user_id, WorkoutSet.exercise_id, Workout.date, Workout.id, WorkoutSet.id)
+    records = []
+    for (record_user_id, exercise_id), group in itertools.groupby(rows.yield_per(1000), key=lambda row: row[:2]):
+        values = fold_personal_records(empty_personal_record(), (row[2:] for row in group))
+        values['rep_records'] = json.dumps(values['rep_records'])
+        records.append(dict(values, user_id=record_user_id, exercise_id=exercise_id))
+    if records:
+        db.session.execute(insert(PersonalRecord), records)
+    db.session.commit()
+    return len(records)
+
+def load_personal_records(user_id, exercise_ids):
+    """{exercise_id: record values} for the given exercises, one indexed read."""
+    if not exercise_ids:
+        return {}
+    return {
+        record.exercise_id: personal_record_values(record)
+        for record in PersonalRecord.query.filter(
+            PersonalRecord.user_id == user_id,
+            PersonalRecord.exercise_id.in_(exercise_ids)
+        )
+    }
+
+def compute_personal_records(user_id, exercise_ids):
+    """{exercise_id: record values} folded from raw sets in memory, without storing them."""
+    rows = personal_record_sets_query()\
+        .filter(Workout.user_id == user_id, WorkoutSet.exercise_id.in_(exercise_ids))\
+        .order_by(WorkoutSet.exercise_id, Workout.date, Workout.id, WorkoutSet.id)
+    return {
+        exercise_id: fold_personal_records(empty_personal_record(), (row[2:] for row in group))
+        for exercise_id, group in itertools.groupby(rows, key=lambda row: row[1])
+    }
+
+def workout_personal_records(workout):
+    """Records for every exercise in the workout, for rendering; never writes.
+
+    Exercises without a stored row (history predating the table) are
+    folded from their sets on the fly. Rows are only written by the
+    aggregate job and live set edits.
+    """
+    exercise_ids = {s.exercise_id for s in workout.sets}
+    records = load_personal_records(workout.user_id, exercise_ids)
+    missing = exercise_ids - set(records)
+    if missing:
+        records.update(compute_personal_records(workout.user_id, missing))
+    return records
+
+def personal_record_flags(workout_id, sets, records):
+    """{set_id: labels} of the records each set holds, for the live workout page.
+
+    A set is flagged when the record's holder is its own workout and its
+    value matches the record, so a PR shows as soon as the set is saved.
+    Sets holding nothing map to an empty list.
+    """
+    flags = {}
+    for s in sets:
+        labels = flags[s.id] = []
+        record = records.get(s.exercise_id)
+        if record is None or not s.completed or s.weight is None or not s.reps:
+            continue
+        if record['best_e1rm_workout_id'] == workout_id and calculate_e1rm(s.weight, s.reps, s.rpe) == record['best_e1rm']:
+            labels.append('e1RM')
+        if record['max_weight_workout_id'] == workout_id and s.weight == record['max_weight']:
+            labels.append('Weight')
+        if record['rep_records'].get(rep_record_key(s.weight)) == [s.reps, workout_id]:
+            labels.append('Reps')
+    return flags
+
+def refresh_workout_record_flags(user_id, workout_id, exercise_ids):
+    """Refresh the records a live edit touched and return the flags of those exercises' sets."""
+    refresh_personal_records(user_id, workout_id, exercise_ids)
+    sets = WorkoutSet.query.filter(WorkoutSet.workout_id == workout_id, WorkoutSet.exercise_id.in_(exercise_ids))
+    return personal_record_flags(workout_id, sets, load_personal_records(user_id, exercise_ids))
+
+# ----------------------- History Helpers -----------------------
+
+HISTORY_PAGE_SIZE = 20
+
+def encode_history_cursor(workout):
+    return f"{workout.date.isoformat()}_{workout.id}"
+
+def decode_history_cursor(cursor):
+    # Returns (date, id) of the last workout already shown, or None for the first page
+    if not cursor:
+        return None
+    try:
+        date, workout_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(date), int(workout_id)
+    except ValueError:
+        return None
+
+def history_cursor_filter(cursor):
+    # Workouts strictly older than the (date, id) cursor
+    date, workout_id = cursor
+    return or_(Workout.date < date, and_(Workout.date == date, Workout.id < workout_id))
+
+def get_history_page(user_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """Load one page of completed workouts, newest first.
+
+    Pages are keyed on (date, id) so each page is an index range read no
+    matter how deep it is. Sets, their exercises and the template are
+    eager-loaded so rendering a page does not issue per-row queries.
+    Returns (workouts, next_cursor); next_cursor is None on the last page.
+    """
+    query = Workout.query\
+        .filter_by(user_id=user_id, completed=True)\
+        .options(
+            selectinload(Workout.sets).joinedload(WorkoutSet.exercise),
+            joinedload(Workout.template)
+        )
+    if cursor:
+        query = query.filter(history_cursor_filter(cursor))
+    workouts = query.order_by(Workout.date.desc(), Workout.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(workouts) > limit:
+        workouts = workouts[:limit]
+        next_cursor = encode_history_cursor(workouts[-1])
+    return workouts, next_cursor
+
+# ----------------------- Import Helpers -----------------------
+
+# Workout log export format members bring from other apps (Data/real_workout_data.csv):
+#
+#   Push                                  <- workout title
+#   Sunday, December 8, 2024 at 3:46 PM
+#
+#   Bench Press (Barbell)                 <- exercise, equipment in parentheses
+#   Set 1: 295 lb x 4
+#   Set 2: +90 lb x 8                     <- weight added to bodyweight
+#   Set 3: 12 reps                        <- no weight
+WORKOUT_LOG_DATE_FORMAT = '%A, %B %d, %Y at %I:%M %p'
+WORKOUT_LOG_SET_PATTERN = re.compile(r'Set \d+: (?:(\+?)(\d+(?:\.\d+)?) lb x (\d+)|(\d+) reps?)')
+WORKOUT_LOG_HEADER_PATTERN = re.compile(r'(.+?)\s*\(([^()]+)\)')
+ADDED_WEIGHT_NOTE = 'Added weight'
+UNNAMED_WORKOUT_TITLE = 'Workout'  # Title exported for workouts without a name
+IMPORTED_EXERCISE_CATEGORY = 'Other'
+IMPORT_CHUNK_SIZE = 500  # Workouts per transaction
+
+def parse_workout_log_date(line):
+    try:
+        return datetime.strptime(line, WORKOUT_LOG_DATE_FORMAT)
+    except ValueError:
+        return None
+
+def parse_workout_log_set(match):
+    added, weight, reps, bare_reps = match.groups()
+    if bare_reps is not None:
+        return {'weight': None, 'reps': int(bare_reps), 'notes': None}
+    return {'weight': float(weight), 'reps': int(reps), 'notes': ADDED_WEIGHT_NOTE if added else None}
+
+def parse_workout_log(lines):
+    """Yield the workouts of a workout log export one at a time.
+
+    A line is a workout title only when the next line is a date, so the
+    parser holds back a single line and never reads ahead any further.
+    """
+    workout = None
+    pending = None  # Title or exercise header, decided by the following line
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if pending is not None:
+            date = parse_workout_log_date(line)
+            if date is not None:
+                if workout is not None:
+                    yield workout
+                workout = {'name': pending, 'date': date, 'exercises': []}
+                pending = None
+                continue
+            if workout is None:
+                raise ValueError(f'Line {line_number - 1}: expected a workout title followed by a date.')
+            workout['exercises'].append({'header': pending, 'sets': []})
+            pending = None
+
+        if not line:
+            continue
+        match = WORKOUT_LOG_SET_PATTERN.fullmatch(line)
+        if match is None:
+            pending = line
+        elif workout is None or not workout['exercises']:
+            raise ValueError(f'Line {line_number}: set listed before any exercise.')
+        else:
+            workout['exercises'][-1]['sets'].append(parse_workout_log_set(match))
+
+    if pending is not None:
+        if workout is None:
+            raise ValueError('Expected a workout title followed by a date.')
+        workout['exercises'].append({'header': pending, 'sets': []})
+    if workout is not None:
+        yield workout
+
+class ExerciseResolver:
+    """Resolves exercise log headers to Exercise ids through normalized names.
+
+    "Bench Press (Barbell)" matches on name and equipment first, then on the
+    name alone. Unknown exercises are created in the catalog.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        for exercise in exercise_catalog.exercises:
+            key = normalize_exercise_name(f"{exercise['name']} {exercise['equipment'] or ''}")
+            self.ids.setdefault(key, exercise['id'])
+        for exercise in exercise_catalog.exercises:
+            self.ids.setdefault(normalize_exercise_name(exercise['name']), exercise['id'])
+        self.created = 0
+
+    def resolve(self, header):
+        key = normalize_exercise_name(header)
+        exercise_id = self.ids.get(key)
+        if exercise_id is None:
+            match = WORKOUT_LOG_HEADER_PATTERN.fullmatch(header)
+            name, equipment = match.groups() if match else (header, None)
+            name_key = normalize_exercise_name(name)
+            exercise_id = self.ids.get(name_key)
+            if exercise_id is None:
+                exercise = Exercise(name=name, category=IMPORTED_EXERCISE_CATEGORY, equipment=equipment)
+                db.session.add(exercise)
+                db.session.flush()
+                exercise_id = self.ids[name_key] = exercise.id
+                self.created += 1
+            self.ids[key] = exercise_id
+        return exercise_id
+
+def insert_workout_chunk(user_id, workouts, resolver):
+    """Bulk insert parsed workouts and their sets, then commit. Returns the set count."""
+    workout_ids = db.session.scalars(
+        insert(Workout).returning(Workout.id, sort_by_parameter_order=True),
+        [
+            {
+                'user_id': user_id,
+                'name': workout['name'],
+                'date': workout['date'],
+                'start_time': workout['date'],
+                'completed': True
+            }
+            for workout in workouts
+        ]
+    ).all()
+    set_rows = [
+        dict(set_values, workout_id=workout_id, exercise_id=resolver.resolve(exercise['header']), completed=True)
+        for workout_id, workout in zip(workout_ids, workouts)
+        for exercise in workout['exercises']
+        for set_values in exercise['sets']
+    ]
+    if set_rows:
+        db.session.execute(insert(WorkoutSet), set_rows)
+    db.session.commit()
+    return len(set_rows)
+
+def import_workout_log(user_id, lines, chunk_size=IMPORT_CHUNK_SIZE):
+    """Stream a workout log export into a user's history.
+
+    Workouts are inserted and committed chunk_size at a time, so memory
+    stays bounded however long the history is. Workouts already in the
+    history (same name and date) are skipped, which makes re-running an
+    import safe. Dates are compared to the minute, the precision the
+    format keeps, so re-importing an export adds nothing. Returns
+    (workouts, sets, exercises created).
+    """
+    resolver = ExerciseResolver()
+    existing = {
+        (name or UNNAMED_WORKOUT_TITLE, date.replace(second=0, microsecond=0))
+        for name, date in db.session.query(Workout.name, Workout.date).filter_by(user_id=user_id)
+    }
+    workout_count = set_count = 0
+    chunk = []
+    for workout in parse_workout_log(lines):
+        if (workout['name'], workout['date']) in existing:
+            continue
+        chunk.append(workout)
+        if len(chunk) >= chunk_size:
+            set_count += insert_workout_chunk(user_id, chunk, resolver)
+            workout_count += len(chunk)
+            chunk = []
+    if chunk:
+        set_count += insert_workout_chunk(user_id, chunk, resolver)
+        workout_count += len(chunk)
+
+    if workout_count:
+        rebuild_workout_aggregates(user_id)
+    return workout_count, set_count, resolver.created
+
+# ----------------------- Export Helpers -----------------------
+
+EXPORT_BATCH_SIZE = 1000  # Rows fetched per round trip while streaming
+
+def format_workout_log_date(date):
+    # Same as WORKOUT_LOG_DATE_FORMAT, without the zero padding strftime adds
+    return f"{date:%A, %B} {date.day}, {date.year} at {date.hour % 12 or 12}:{date:%M %p}"
+
+def format_workout_log_set(number, weight, reps, notes):
+    if weight is None:
+        return f'Set {number}: {reps} reps'
+    added = '+' if notes == ADDED_WEIGHT_NOTE else ''
+    return f'Set {number}: {added}{weight:g} lb x {reps}'
+
+def export_rows(user_id):
+    """Stream a user's completed workouts with their sets, oldest first.
+
+    Rows come through a server-side cursor in EXPORT_BATCH_SIZE batches, so
+    memory stays flat however long the history is.
+    """
+    return db.session.query(
+            Workout.id.label('workout_id'),
+            Workout.name.label('workout_name'),
+            Workout.date,
+            Workout.notes.label('workout_notes'),
+            WorkoutSet.exercise_id,
+            Exercise.name.label('exercise_name'),
+            Exercise.equipment,
+            WorkoutSet.weight,
+            WorkoutSet.reps,
+            WorkoutSet.rpe,
+            WorkoutSet.rir,
+            WorkoutSet.notes,
+            WorkoutSet.completed
+        )\
+        .outerjoin(WorkoutSet, WorkoutSet.workout_id == Workout.id)\
+        .outerjoin(Exercise, Exercise.id == WorkoutSet.exercise_id)\
+        .filter(Workout.user_id == user_id, Workout.completed == True)\
+        .order_by(Workout.date, Workout.id, WorkoutSet.id)\
+        .yield_per(EXPORT_BATCH_SIZE)
+
+def iter_workout_log_export(user_id):
+    """Yield the history in the workout log format parse_workout_log() reads.
+
+    Sets without reps cannot be written in that format and are left out.
+    """
+    for _, rows in itertools.groupby(export_rows(user_id), key=lambda row: row.workout_id):
+        lines = []
+        exercise_id = None
+        number = 0
+        for row in rows:
+            if not lines:
+                lines = [row.workout_name or UNNAMED_WORKOUT_TITLE, format_workout_log_date(row.date)]
+            if row.reps is None:
+                continue
+            if row.exercise_id != exercise_id:
+                exercise_id = row.exercise_id
+                number = 0
+                header = f'{row.exercise_name} ({row.equipment})' if row.equipment else row.exercise_name
+                lines += ['', header]
+            number += 1
+            lines.append(format_workout_log_set(number, row.weight, row.reps, row.notes))
+        yield '\n'.join(lines) + '\n\n'
+
+def iter_ndjson_export(user_id):
+    """Yield one JSON object per workout, sets nested, one per line."""
+    for _, rows in itertools.groupby(export_rows(user_id), key=lambda row: row.workout_id):
+        workout = None
+        for row in rows:
+            if workout is None:
+                workout = {
+                    'id': row.workout_id,
+                    'name': row.workout_name,
+                    'date': row.date.isoformat(),
+                    'notes': row.workout_notes,
+                    'sets': []
+                }
+            if row.exercise_id is not None:
+                workout['sets'].append({
+                    'exercise_id': row.exercise_id,
+                    'exercise': row.exercise_name,
+                    'equipment': row.equipment,
+                    'weight': row.weight,
+                    'reps': row.reps,
+                    'rpe': row.rpe,
+                    'rir': row.rir,
+                    'notes': row.notes,
+                    'completed': row.completed
+                })
+        yield json.dumps(workout, separators=(',', ':')) + '\n'
+
+# ----------------------- API Helpers -----------------------
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_GZIP_MIN_BYTES = 1024  # Smaller bodies gain little from compression
+
+def api_page_size(default=API_PAGE_SIZE):
+    return min(max(request.args.get('limit', default, type=int), 1), API_MAX_PAGE_SIZE)
+
+def api_response(payload):
+    """Serialize payload compactly, with an ETag and gzip when the client accepts it.
+
+    The tag hashes the uncompressed body, so every worker hands out the same
+    one for the same data and a client revalidating what it has gets a 304.
+    """
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    response = app.response_class(body, mimetype='application/json')
+    # Weak, because the gzip and identity encodings share it
+    response.set_etag(hashlib.sha1(body).hexdigest()[:16], weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    response = response.make_conditional(request)
+    if response.status_code == 200 and len(body) >= API_GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def format_api_date(date):
+    return date.isoformat(timespec='seconds') if date else None
+
+def exercise_names(exercise_ids):
+    """{id: name} for the exercises a payload refers to, from the in-process catalog."""
+    by_id = exercise_catalog.by_id
+    return {exercise_id: by_id[exercise_id]['name'] for exercise_id in sorted(set(exercise_ids)) if exercise_id in by_id}
+
+def workout_set_columns(workout_ids):
+    """Sets of the given workouts as parallel arrays, in logging order."""
+    columns = {field: [] for field in ('id', 'workout_id', 'exercise_id', 'weight', 'reps', 'rpe', 'rir', 'notes', 'completed')}
+    if not workout_ids:
+        return columns
+    rows = db.session.query(
+            WorkoutSet.id,
+            WorkoutSet.workout_id,
+            WorkoutSet.exercise_id,
+            WorkoutSet.weight,
+            WorkoutSet.reps,
+            WorkoutSet.rpe,
+            WorkoutSet.rir,
+            WorkoutSet.notes,
+            WorkoutSet.completed
+        )\
+        .filter(WorkoutSet.workout_id.in_(workout_ids))\
+        .order_by(WorkoutSet.workout_id, WorkoutSet.id)
+    for row in rows:
+        for field, value in zip(columns, row):
+            columns[field].append(value)
+    return columns
+
+def history_columns(user_id, cursor=None, limit=API_PAGE_SIZE):
+    """One page of completed workouts as parallel arrays, newest first.
+
+    Same (date, id) keyset as get_history_page(), but only the columns the
+    payload needs are selected. Returns (payload, next_cursor).
+    """
+    query = db.session.query(
+            Workout.id,
+            Workout.date,
+            func.coalesce(Workout.name, WorkoutTemplate.name).label('name'),
+            Workout.duration,
+            Workout.template_id
+        )\
+        .outerjoin(WorkoutTemplate, WorkoutTemplate.id == Workout.template_id)\
+        .filter(Workout.user_id == user_id, Workout.completed == True)
+    if cursor:
+        query = query.filter(history_cursor_filter(cursor))
+    rows = query.order_by(Workout.date.desc(), Workout.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_history_cursor(rows[-1])
+    workout_ids = [row.id for row in rows]
+    sets = workout_set_columns(workout_ids)
+    payload = {
+        'workouts': {
+            'id': workout_ids,
+            'date': [format_api_date(row.date) for row in rows],
+            'name': [row.name for row in rows],
+            'duration': [row.duration for row in rows],
+            'template_id': [row.template_id for row in rows]
+        },
+        'sets': sets,
+        'exercises': exercise_names(sets['exercise_id'])
+    }
+    return payload, next_cursor
+
+# ----------------------- Analytics Snapshot -----------------------
+
+# One row per completed set; missing weight, reps, RPE or RIR are NaN
+SNAPSHOT_DTYPE = np.dtype([
+    ('date', 'datetime64[s]'),
+    ('exercise_id', np.int32),
+    ('weight', np.float64),
+    ('reps', np.float64),
+    ('rpe', np.float64),
+    ('rir', np.float64),
+])
+
+def snapshot_path(user_id):
+    return os.path.join(app.config['ANALYTICS_DIR'], f'user_{user_id}.npy')
+
+def build_analytics_snapshot(user_id):
+    """Write a user's completed sets to their .npy snapshot file.
+
+    Run by the workout_aggregates job and rebuild_workout_aggregates(),
+    never on a page read.
+    """
+    rows = db.session.query(
+            Workout.date,
+            WorkoutSet.exercise_id,
+            WorkoutSet.weight,
+            WorkoutSet.reps,
+            WorkoutSet.rpe,
+            WorkoutSet.rir
+        )\
+        .select_from(WorkoutSet)\
+        .join(Workout, WorkoutSet.workout_id == Workout.id)\
+        .filter(
+            Workout.user_id == user_id,
+            Workout.completed == True,
+            WorkoutSet.completed == True
+        )\
+        .order_by(Workout.date, WorkoutSet.id)\
+        .yield_per(EXPORT_BATCH_SIZE)
+    nan = float('nan')
+    sets = np.fromiter(
+        (
+            (
+                row.date,
+                row.exercise_id,
+                nan if row.weight is None else row.weight,
+                nan if row.reps is None else row.reps,
+                nan if row.rpe is None else row.rpe,
+                nan if row.rir is None else row.rir
+            )
+            for row in rows
+        ),
+        dtype=SNAPSHOT_DTYPE
+    )
+
+    # Write next to the target and swap it in, so readers never map a partial file
+    path = snapshot_path(user_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as snapshot_file:
+        np.save(snapshot_file, sets)
+    os.replace(temp_path, path)
+
+def mark_analytics_stale(user_id):
+    """Delete the user's snapshot once the session commits, for data removed wholesale."""
+    db.session.info.setdefault('stale_analytics_users', set()).add(user_id)
+
+@event.listens_for(Session, 'after_commit')
+def remove_stale_analytics_snapshots(session):
+    for user_id in session.info.pop('stale_analytics_users', ()):
+        try:
+            os.remove(snapshot_path(user_id))
+        except FileNotFoundError:
+            pass
+
+@event.listens_for(Session, 'after_rollback')
+def discard_stale_analytics_users(session):
+    session.info.pop('stale_analytics_users', None)
+
+class AnalyticsSnapshot:
+    """Vectorized metrics over one user's completed sets.
+
+    The sets are a structured array memory-mapped from the user's snapshot
+    file, which the workout_aggregates job rewrites after a workout is
+    finished or edited. Readers only map the file; a user without one
+    (nothing finished yet, or not backfilled by flask rebuild-progress)
+    has no sets. Each metric is a handful of array operations.
+    """
+
+    def __init__(self, sets):
+        self.sets = sets
+
+    @classmethod
+    def load(cls, user_id):
+        try:
+            return cls(np.load(snapshot_path(user_id), mmap_mode='r'))
+        except FileNotFoundError:
+            return cls(np.empty(0, dtype=SNAPSHOT_DTYPE))
+
+    @property
+    def set_count(self):
+        return len(self.sets)
+
+    def e1rm(self):
+        """Per-set estimated 1RM, same formula as calculate_e1rm(); NaN without weight and reps."""
+        base = self.sets['weight'] * (1 + self.sets['reps'] / 30)
+        rpe = self.sets['rpe']
+        return np.where(np.isnan(rpe), base, base * rpe / 10)
+
+    def tonnage(self):
+        """Per-set weight x reps, 0 when either is missing."""
+        return np.nan_to_num(self.sets['weight'] * self.sets['reps'])
+
+    def _by_exercise(self, values, reduce):
+        exercise_ids, groups = np.unique(self.sets['exercise_id'], return_inverse=True)
+        totals = np.full(len(exercise_ids), np.nan if reduce is np.fmax else 0.0)
+        reduce.at(totals, groups, values)
+        return dict(zip(exercise_ids.tolist(), totals.tolist()))
+
+    def best_e1rm_by_exercise(self):
+        return {
+            exercise_id: best
+            for exercise_id, best in self._by_exercise(self.e1rm(), np.fmax).items()
+            if not np.isnan(best)
+        }
+
+    def tonnage_by_exercise(self):
+        return self._by_exercise(self.tonnage(), np.add)
+
+    def sets_by_exercise(self):
+        counts = self._by_exercise(np.ones(self.set_count), np.add)
+        return {exercise_id: int(count) for exercise_id, count in counts.items()}
+
+    def volume_by_category(self):
+        """{category: {'sets': n, 'tonnage': lb}} using the cached exercise catalog."""
+        by_id = exercise_catalog.by_id
+        tonnage = self.tonnage_by_exercise()
+        volume = {}
+        for exercise_id, sets in self.sets_by_exercise().items():
+            exercise = by_id.get(exercise_id)
+            category = exercise['category'] if exercise else IMPORTED_EXERCISE_CATEGORY
+            totals = volume.setdefault(category, {'sets': 0, 'tonnage': 0.0})
+            totals['sets'] += sets
+            totals['tonnage'] += tonnage[exercise_id]
+        return volume
+
+    def summary(self):
+        return {
+            'sets': self.set_count,
+            'tonnage': float(self.tonnage().sum()),
+            'volume_by_category': self.volume_by_category(),
+            'best_e1rm_by_exercise': self.best_e1rm_by_exercise()
+        }
+
+# ----------------------- Account Helpers -----------------------
+
+def purge_user_data(user):
+    """Delete everything the user has logged, keeping the account. The caller commits.
+
+    One DELETE per top-level table: templates, template exercises, sets and
+    progress rows follow through ON DELETE CASCADE. Returns rows removed per table.
+    """
+    # Read before the cascade removes them, to drop their cached start plans
+    template_ids = [template_id for template_id, in db.session.query(WorkoutTemplate.id)
+                    .join(Folder, WorkoutTemplate.folder_id == Folder.id)
+                    .filter(Folder.user_id == user.id)]
+    counts = {
+        'folder': Folder.query.filter_by(user_id=user.id).delete(synchronize_session=False),
+        'workout': Workout.query.filter_by(user_id=user.id).delete(synchronize_session=False),
+        'weekly volume': WeeklyVolume.query.filter_by(user_id=user.id).delete(synchronize_session=False),
+        'personal record': PersonalRecord.query.filter_by(user_id=user.id).delete(synchronize_session=False),
+    }
+    refresh_user_counters(user)
+    mark_analytics_stale(user.id)
+    for template_id in template_ids:
+        invalidate_template_plan(template_id)
+    return counts
+
+# ----------------------- Template Helpers -----------------------
+
+# (shard, template_id) -> (template revision, WorkoutSet column values for every
+# set the template starts with); template ids are only unique within a shard
+_template_plans = {}
+
+def parse_template_reps(reps):
+    # If reps contains a range (e.g., "8-12"), take the first number
+    if not reps:
+        return None
+    try:
+        return int(reps.split('-')[0]) if '-' in reps else int(reps)
+    except (ValueError, AttributeError):
+        return None
+
+def get_template_plan(template):
+    """Return the parsed set rows a workout started from this template gets.
+
+    Parsed once per template revision and cached in-process. The template
+    exercise routes renew the revision, and a template id SQLite reuses
+    after a delete comes with a new one, so an entry is only served while
+    the template row still carries its revision, whichever process wrote it.
+    """
+    cache_key = (shard_router.current_key(), template.id)
+    cached = _template_plans.get(cache_key)
+    if cached is not None and cached[0] == template.revision:
+        plan = cached[1]
+    else:
+        template_exercises = TemplateExercise.query\
+            .filter_by(template_id=template.id)\
+            .order_by(TemplateExercise.id)\
+            .all()
+        plan = tuple(
+            {
+                'exercise_id': template_exercise.exercise_id,
+                'weight': template_exercise.weight,
+                'reps': parse_template_reps(template_exercise.reps),
+                'rpe': template_exercise.rpe,
+                'rir': template_exercise.rir,
+                'notes': template_exercise.notes,
+                'completed': False
+            }
+            for template_exercise in template_exercises
+            # Create the specified number of sets for each exercise
+            for _ in range(template_exercise.sets)
+        )
+        _template_plans[cache_key] = (template.revision, plan)
+    return plan
+
+def touch_template(template):
+    """Renew the template's revision after its exercises changed. The caller commits."""
+    template.revision = uuid.uuid4().hex
+
+def invalidate_template_plan(template_id):
+    _template_plans.pop((shard_router.current_key(), template_id), None)
+
+# ----------------------- Workout Helpers -----------------------
+
+# Editable set fields and the type each submitted value is converted to
+SET_FIELD_TYPES = {
+    'weight': float,
+    'reps': int,
+    'rpe': float,
+    'rir': int,
+    'notes': str
+}
+SET_FIELD_PATTERN = re.compile(r'sets\[(\d+)\]\[(\w+)\]')
+
+def parse_set_patches(form):
+    # Group sets[<id>][<field>] form keys into {set_id: {field: value}}
+    patches = {}
+    for key, value in form.items():
+        match = SET_FIELD_PATTERN.fullmatch(key)
+        if match:
+            patches.setdefault(int(match.group(1)), {})[match.group(2)] = value
+    return patches
+
+def coerce_set_fields(fields):
+    # Convert submitted values to column types; empty values clear the field
+    values = {}
+    for field, value in fields.items():
+        if field not in SET_FIELD_TYPES:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        values[field] = SET_FIELD_TYPES[field](value) if value not in (None, '') else None
+    return values
+
+def apply_set_patches(workout_id, patches):
+    """Write {set_id: values} patches to one workout's sets and mark them completed.
+
+    Sets that do not belong to the workout are skipped. Ownership is checked
+    with a single IN query and the changes go out as one bulk UPDATE; the
+    caller commits. Returns the ids of the updated sets.
+    """
+    if not patches:
+        return []
+    owned = {set_id for set_id, in db.session.query(WorkoutSet.id).filter(
+        WorkoutSet.workout_id == workout_id,
+        WorkoutSet.id.in_(patches)
+    )}
+    rows = [dict(values, id=set_id, completed=True) for set_id, values in patches.items() if set_id in owned]
+    if rows:
+        db.session.execute(update(WorkoutSet), rows)
+    return [row['id'] for row in rows]
+
+def apply_autosave_changes(changes):
+    # Rows sharing the same columns go out as one executemany UPDATE. The
+    # client_seq guard keeps a concurrently applied newer batch from being
+    # overwritten between the ownership read and this write.
+    groups = {}
+    for change in changes:
+        groups.setdefault(tuple(sorted(change)), []).append(change)
+
+    workout_set = WorkoutSet.__table__
+    for columns, rows in groups.items():
+        stmt = update(workout_set)\
+            .where(
+                workout_set.c.id == bindparam('b_id'),
+                or_(workout_set.c.client_seq.is_(None), workout_set.c.client_seq < bindparam('b_client_seq'))
+            )\
+            .values({column: bindparam(f'b_{column}') for column in columns if column != 'id'})
+        db.session.execute(stmt, [{f'b_{column}': row[column] for column in columns} for row in rows])
+
+def get_workout_page_or_404(workout_id):
+    """Load a workout for the live and history edit pages, sets and their exercises included.
+
+    Eager-loaded so rendering the sets grouped by exercise name does not
+    issue a query per exercise.
+    """
+    return Workout.query\
+        .options(selectinload(Workout.sets).joinedload(WorkoutSet.exercise))\
+        .filter_by(id=workout_id)\
+        .first_or_404()
+
+def get_last_performances(workout):
+    """Map each exercise in the workout to its sets from the previous session.
+
+    Returns {exercise_id: {set_index: {'weight', 'reps', 'rpe', 'date'}}},
+    resolved for all exercises at once with a window over the user's
+    earlier workouts instead of two queries per exercise.
+    """
+    exercise_ids = {s.exercise_id for s in workout.sets}
+    if not exercise_ids:
+        return {}
+
+    # Rank each earlier workout per exercise, most recent first
+    session_rank = func.dense_rank().over(
+        partition_by=WorkoutSet.exercise_id,
+        order_by=(Workout.date.desc(), Workout.id.desc())
+    ).label('session_rank')
+    ranked = db.session.query(
+            WorkoutSet.id,
+            WorkoutSet.exercise_id,
+            WorkoutSet.weight,
+            WorkoutSet.reps,
+            WorkoutSet.rpe,
+            Workout.date,
+            session_rank
+        )\
+        .join(Workout, WorkoutSet.workout_id == Workout.id)\
+        .filter(
+            Workout.user_id == workout.user_id,
+            Workout.id != workout.id,
+            WorkoutSet.exercise_id.in_(exercise_ids),
+            WorkoutSet.completed == True,
+            WorkoutSet.weight.isnot(None),
+            WorkoutSet.reps.isnot(None)
+        )\
+        .subquery()
+
+    previous_sets = db.session.query(ranked)\
+        .filter(ranked.c.session_rank == 1)\
+        .order_by(ranked.c.exercise_id, ranked.c.id)\
+        .all()
+
+    # Store each set's data in a dictionary
+    last_performances = {}
+    for prev_set in previous_sets:
+        sets_by_index = last_performances.setdefault(prev_set.exercise_id, {})
+        sets_by_index[len(sets_by_index)] = {
+            'weight': prev_set.weight,
+            'reps': prev_set.reps,
+            'rpe': prev_set.rpe,
+            'date': prev_set.date
+        }
+    return last_performances
+
+
+# ----------------------- Page Cache -----------------------
+
+class PageCache:
+    """LRU cache of rendered pages, keyed by the user's data version.
+
+    The version is user.data_version, which every commit writing a user's
+    rows bumps in the database, so writes from CLI commands, job workers
+    and other server processes invalidate pages as well. Entries for older
+    versions can never be hit again and simply age out. The cache is
+    bounded by the total size of the cached bodies.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, mimetype, headers):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self._entries[key] = (body, mimetype, headers)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+page_cache = PageCache(app.config['PAGE_CACHE_MAX_BYTES'])
+
+# Response headers that must not be replayed to later requests
+UNCACHED_HEADERS = {'Content-Length', 'Content-Type', 'Set-Cookie', 'Vary'}
+
+def cached_page(view):
+    """Serve a login_required GET view from the page cache.
+
+    Responses that will show flashed messages are neither served from nor
+    stored in the cache.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not page_cache.max_bytes or '_flashes' in session:
+            return view(*args, **kwargs)
+
+        # The user row is loaded for every request anyway, so the version check costs no query
+        key = (current_user.id, request.endpoint, request.full_path, current_user.data_version)
+        entry = page_cache.get(key)
+        if entry is not None:
+            body, mimetype, headers = entry
+            response = Response(body, mimetype=mimetype, headers=headers)
+            response.headers['X-Page-Cache'] = 'hit'
+            return response
+
+        response = app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            headers = [(name, value) for name, value in response.headers if name not in UNCACHED_HEADERS]
+            page_cache.put(key, response.get_data(), response.mimetype, headers)
+        response.headers['X-Page-Cache'] = 'miss'
+        return response
+    return wrapper
+
+def bump_data_version(user_id=None):
+    """Invalidate the cached pages of one user, or of everyone when user_id is None. The caller commits."""
+    stmt = update(User).values(data_version=User.data_version + 1)
+    if user_id is not None:
+        stmt = stmt.where(User.id == user_id)
+    db.session.execute(stmt.execution_options(synchronize_session=False))
+
+def mark_user_data_changed(session):
+    # Writes made on behalf of a user (a request or shard_router.using()) invalidate their pages
+    try:
+        user_id = shard_router.current_user_id()
+    except RuntimeError:
+        return
+    session.info.setdefault('changed_user_ids', set()).add(user_id)
+
+@event.listens_for(Session, 'after_flush')
+def mark_user_data_flushed(session, flush_context):
+    mark_user_data_changed(session)
+
+@event.listens_for(Session, 'do_orm_execute')
+def mark_user_data_changed_by_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mark_user_data_changed(orm_execute_state.session)
+
+@event.listens_for(Session, 'before_commit')
+def bump_user_data_versions(session):
+    # Flush first so pending objects are counted, then bump in the same transaction.
+    # The user table may live in another database than the shard written to.
+    session.flush()
+    user_ids = session.info.pop('changed_user_ids', None)
+    if user_ids:
+        user = User.__table__
+        session.connection(bind_arguments={'mapper': User}).execute(
+            update(user).where(user.c.id.in_(user_ids)).values(data_version=user.c.data_version + 1)
+        )
+
+@event.listens_for(Session, 'after_rollback')
+def discard_user_data_change(session):
+    session.info.pop('changed_user_ids', None)
+
+# ----------------------- SQL Profiling -----------------------
+
+class SQLProfile:
+    """Statements executed while the profile is active, with their durations."""
+
+    def __init__(self):
+        self.statements = []  # (statement, seconds)
+
+    @property
+    def query_count(self):
+        return len(self.statements)
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration in self.statements)
+
+    def slowest(self, limit=5):
+        return heapq.nlargest(limit, self.statements, key=lambda item: item[1])
+
+    def repeated_shapes(self, threshold):
+        """Statement shapes run at least `threshold` times: likely N+1 lazy loads."""
+        counts = collections.Counter(statement_shape(statement) for statement, _ in self.statements)
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+    def summary(self, threshold):
+        return {
+            'queries': self.query_count,
+            'db_ms': round(self.total_time * 1000, 2),
+            'slowest': [(statement_shape(statement), round(duration * 1000, 2)) for statement, duration in self.slowest()],
+            'n_plus_one': self.repeated_shapes(threshold)
+        }
+
+def statement_shape(statement):
+    # Collapse whitespace and expanded IN lists so "IN (?, ?)" and "IN (?, ?, ?)" match
+    return re.sub(r'\(\?(?:, \?)*\)', '(?)', ' '.join(statement.split()))
+
+_active_sql_profiles = contextvars.ContextVar('active_sql_profiles', default=())
+recent_request_profiles = collections.deque(maxlen=app.config['SQL_PROFILE_HISTORY'])
+
+@contextlib.contextmanager
+def profile_sql():
+    """Record every statement run inside the block (on any engine, shards included)."""
+    profile = SQLProfile()
+    token = _active_sql_profiles.set(_active_sql_profiles.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        _active_sql_profiles.reset(token)
+
+@contextlib.contextmanager
+def assert_query_budget(limit):
+    """Fail when the block runs more than `limit` statements.
+
+        with assert_query_budget(3):
+            client.get('/stats')
+    """
+    with profile_sql() as profile:
+        yield profile
+    if profile.query_count > limit:
+        shapes = '\n'.join(f'  {count}x {shape}' for shape, count in profile.repeated_shapes(1))
+        raise AssertionError(f'{profile.query_count} queries, budget is {limit}:\n{shapes}')
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    if _active_sql_profiles.get():
+        conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_statement_time(conn, cursor, statement, parameters, context, executemany):
+    profiles = _active_sql_profiles.get()
+    if profiles and conn.info.get('statement_started'):
+        duration = time.perf_counter() - conn.info['statement_started'].pop()
+        for profile in profiles:
+            profile.statements.append((statement, duration))
+
+@app.before_request
+def start_request_profile():
+    if app.config['SQL_PROFILING']:
+        g.request_started = time.perf_counter()
+        g.sql_profile = SQLProfile()
+        g.sql_profile_token = _active_sql_profiles.set(_active_sql_profiles.get() + (g.sql_profile,))
+
+@app.after_request
+def report_request_profile(response):
+    profile = g.pop('sql_profile', None)
+    if profile is None:
+        return response
+
+    summary = profile.summary(app.config['N_PLUS_ONE_THRESHOLD'])
+    summary.update(
+        method=request.method,
+        path=request.full_path.rstrip('?'),
+        endpoint=request.endpoint,
+        status=response.status_code,
+        total_ms=round((time.perf_counter() - g.pop('request_started')) * 1000, 2)
+    )
+    recent_request_profiles.append(summary)
+    response.headers['X-Query-Count'] = str(summary['queries'])
+
+    app.logger.info('%s %s: %d queries, %.2f ms in DB, %.2f ms total',
+                    summary['method'], summary['path'], summary['queries'], summary['db_ms'], summary['total_ms'])
+    for shape, count in summary['n_plus_one']:
+        app.logger.warning('Possible N+1 on %s: %dx %s', summary['path'], count, shape)
+    return response
+
+@app.teardown_request
+def stop_request_profile(exception):
+    # Runs even when the view raised, so the profile never leaks into the next request
+    token = g.pop('sql_profile_token', None)
+    if token is not None:
+        _active_sql_profiles.reset(token)
+
+# ----------------------- Job Queue -----------------------
+
+job_handlers = {}
+
+def job_handler(kind):
+    """Register handler(payload) for jobs of this kind.
+
+    Handlers run inside a transaction the queue commits, routed to the
+    job's user shard, and must be safe to run more than once.
+    """
+    def register(handler):
+        job_handlers[kind] = handler
+        return handler
+    return register
+
+def job_now():
+    return cstnow().replace(tzinfo=None)
+
+def enqueue_job(kind, key, payload=None, user_id=None):
+    """Queue work to run outside the request. The caller commits.
+
+    Jobs are idempotent by key: enqueueing a key that is still pending only
+    refreshes its payload and user, while one that is running or finished gets a new
+    generation and runs again on the latest data. Without a running worker
+    pool (tests, CLI commands, scripts) the handler runs inline instead.
+    """
+    payload = payload or {}
+    if not job_queue.running:
+        job_handlers[kind](payload)
+        return
+
+    now = job_now()
+    finished = Job.status.in_(('done', 'failed'))
+    stmt = sqlite_insert(Job).values(
+        kind=kind, key=key, payload=json.dumps(payload), user_id=user_id, status='pending',
+        generation=0, attempts=0, max_attempts=app.config['JOB_MAX_ATTEMPTS'],
+        run_after=now, created_at=now, updated_at=now
+    )
+    stmt = stmt.on_conflict_do_update(index_elements=[Job.key], set_={
+        'payload': stmt.excluded.payload,
+        'user_id': stmt.excluded.user_id,
+        'generation': Job.generation + 1,
+        'status': case((Job.status == 'running', 'running'), else_='pending'),
+        'attempts': case((finished, 0), else_=Job.attempts),
+        'run_after': case((finished, now), else_=Job.run_after),
+        'updated_at': now
+    })
+    db.session.execute(stmt)
+    db.session.info['jobs_enqueued'] = True
+
+@event.listens_for(Session, 'after_commit')
+def wake_job_workers(session):
+    if session.info.pop('jobs_enqueued', False):
+        job_queue.wake()
+
+@event.listens_for(Session, 'after_rollback')
+def discard_enqueued_jobs(session):
+    session.info.pop('jobs_enqueued', None)
+
+def claim_job():
+    """Mark the next due job running and return it, or None. One UPDATE, so no job runs twice."""
+    now = job_now()
+    due = select(Job.id)\
+        .where(Job.status == 'pending', Job.run_after <= now)\
+        .order_by(Job.run_after, Job.id)\
+        .limit(1)\
+        .scalar_subquery()
+    stmt = update(Job)\
+        .where(Job.id == due)\
+        .values(status='running', attempts=Job.attempts + 1, updated_at=now)\
+        .returning(Job.id, Job.kind, Job.payload, Job.user_id, Job.generation, Job.attempts, Job.max_attempts)\
+        .execution_options(synchronize_session=False)
+    job = db.session.execute(stmt).first()
+    db.session.commit()
+    return job
+
+def retry_delay(attempts):
+    return min(app.config['JOB_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1), app.config['JOB_RETRY_MAX_SECONDS'])
+
+def run_next_job():
+    """Claim and run one due job. Returns False when nothing was due."""
+    with app.app_context():
+        job = claim_job()
+        if job is None:
+            return False
+        try:
+            handler = job_handlers.get(job.kind)
+            if handler is None:
+                raise LookupError(f'No handler registered for {job.kind} jobs')
+            with shard_router.using(job.user_id):
+                handler(json.loads(job.payload))
+                # Completed only if the key was not enqueued again while this ran
+                db.session.execute(
+                    update(Job)
+                    .where(Job.id == job.id)
+                    .values(
+                        status=case((Job.generation == job.generation, 'done'), else_='pending'),
+                        last_error=None,
+                        updated_at=job_now()
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            failed = job.attempts >= job.max_attempts
+            app.logger.warning('Job %s (%s) attempt %d/%d failed: %s',
+                               job.id, job.kind, job.attempts, job.max_attempts, e)
+            now = job_now()
+            db.session.execute(
+                update(Job)
+                .where(Job.id == job.id)
+                .values(
+                    status='failed' if failed else 'pending',
+                    run_after=now if failed else now + timedelta(seconds=retry_delay(job.attempts)),
+                    last_error=f'{type(e).__name__}: {e}',
+                    updated_at=now
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        return True
+
+def drain_jobs():
+    """Run due jobs in this thread until none are left. Returns how many ran."""
+    count = 0
+    while run_next_job():
+        count += 1
+    return count
+
+class JobQueue:
+    """Worker threads draining the job table, started with the server.
+
+    Idle workers sleep until a commit enqueues work or the poll interval
+    passes (retries coming due). Jobs left running by a previous process
+    are put back to pending when the pool starts.
+    """
+
+    def __init__(self):
+        self.running = False
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def start(self, workers):
+        if self.running or workers <= 0:
+            return
+        with app.app_context():
+            db.create_all()
+            Job.query.filter_by(status='running').update({'status': 'pending'}, synchronize_session=False)
+            db.session.commit()
+        self._stopping.clear()
+        self.running = True
+        for number in range(workers):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.running = False
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                ran = run_next_job()
+            except Exception:
+                app.logger.exception('Job worker failed to claim a job')
+                ran = False
+            if not ran:
+                self._wakeup.wait(app.config['JOB_POLL_SECONDS'])
+                self._wakeup.clear()
+
+job_queue = JobQueue()
+
+@job_handler('workout_aggregates')
+def workout_aggregates_job(payload):
+    # Progress, weekly volume and personal records of one workout, then the
+    # owner's analytics snapshot. The snapshot reads this transaction's
+    # writes; if the commit fails, the retry writes it again.
+    workout = db.session.get(Workout, payload['workout_id'])
+    if workout is not None:
+        refresh_workout_aggregates(workout)
+        build_analytics_snapshot(workout.user_id)
+
+def enqueue_workout_aggregates(workout):
+    # Workout ids are only unique within a shard, so the key names the owner too
+    enqueue_job('workout_aggregates', f'workout_aggregates:{workout.user_id}:{workout.id}',
+                {'workout_id': workout.id}, workout.user_id)
 
 # ----------------------- Routes -----------------------
 
@@ -183,51 +2612,37 @@ def register():
 @app.route('/template/<int:template_id>/start', methods=['POST', 'GET'])
 @login_required
 def start_workout(template_id):
-    template = WorkoutTemplate.query.get_or_404(template_id)
+    template = WorkoutTemplate.query\
+        .options(joinedload(WorkoutTemplate.folder))\
+        .filter_by(id=template_id)\
+        .first_or_404()
     if template.folder.user_id != current_user.id:
         flash("You don't have access to this template.", 'error')
         return redirect(url_for('dashboard'))
 
     try:
         # Create the workout
+        started = cstnow()
         new_workout = Workout(
             user_id=current_user.id,
             template_id=template_id,
-            date=cstnow(),  # Changed from datetime.utcnow()
+            date=started,  # Changed from datetime.utcnow()
+            start_time=started,
             name=template.name,
             notes=None
         )
         db.session.add(new_workout)
-        db.session.commit()
+        db.session.flush()
 
-        # Create sets from template exercises
-        for template_exercise in template.exercises:
-            # Create the specified number of sets for each exercise
-            for _ in range(template_exercise.sets):
-                # Handle reps conversion properly
-                reps_value = None
-                if template_exercise.reps:
-                    # If reps contains a range (e.g., "8-12"), take the first number
-                    try:
-                        reps_value = int(template_exercise.reps.split('-')[0]) if '-' in template_exercise.reps else int(template_exercise.reps)
-                    except (ValueError, AttributeError):
-                        reps_value = None
-
-                new_set = WorkoutSet(
-                    workout_id=new_workout.id,
-                    exercise_id=template_exercise.exercise_id,
-                    weight=template_exercise.weight,  # This will already be float or None
-                    reps=reps_value,
-                    rpe=template_exercise.rpe,    # This will already be float or None
-                    rir=template_exercise.rir,    # This will already be int or None
-                    notes=template_exercise.notes,
-                    completed=False
-                )
-                db.session.add(new_set)
-        
+        # Create sets from template exercises in one bulk insert
+        new_sets = [dict(row, workout_id=new_workout.id) for row in get_template_plan(template)]
+        if new_sets:
+            db.session.execute(insert(WorkoutSet), new_sets)
+
+        workout_id = new_workout.id
         db.session.commit()
         flash('Workout started from template!', 'success')
-        return redirect(url_for('view_workout', workout_id=new_workout.id))
+        return redirect(url_for('view_workout', workout_id=workout_id))
 
     except Exception as e:
         db.session.rollback()
@@ -235,8 +2650,12 @@ def start_workout(template_id):
         return redirect(url_for('dashboard'))
 @app.route('/dashboard')
 @login_required
+@cached_page
 def dashboard():
-    folders = Folder.query.filter_by(user_id=current_user.id).all()
+    folders = Folder.query\
+        .filter_by(user_id=current_user.id)\
+        .options(selectinload(Folder.templates))\
+        .all()
     current_workout = Workout.query.filter_by(
         user_id=current_user.id, 
         completed=False
@@ -272,13 +2691,13 @@ def delete_folder(folder_id):
         flash("You don't have permission to delete this folder.", 'error')
         return redirect(url_for('dashboard'))
     
-    # Delete all associated templates and their exercises
-    for template in folder.templates:
-        TemplateExercise.query.filter_by(template_id=template.id).delete()
-    WorkoutTemplate.query.filter_by(folder_id=folder_id).delete()
-    
+    # Templates and their exercises go with the folder through ON DELETE CASCADE;
+    # only their ids are read, for the template plan cache
+    template_ids = [row.id for row in db.session.query(WorkoutTemplate.id).filter_by(folder_id=folder_id)]
     db.session.delete(folder)
     db.session.commit()
+    for template_id in template_ids:
+        invalidate_template_plan(template_id)
     flash('Folder and all its templates deleted successfully.', 'success')
     return redirect(url_for('dashboard'))
 
@@ -333,6 +2752,7 @@ def update_template_exercise(template_id, exercise_id):
     
     exercise.notes = request.form.get('notes') or None
     
+    touch_template(template)
     db.session.commit()
     flash('Exercise updated successfully.', 'success')
     return redirect(url_for('edit_template', template_id=template_id))
@@ -345,11 +2765,10 @@ def delete_template(template_id):
         flash("You don't have permission to delete this template.", 'error')
         return redirect(url_for('dashboard'))
     
-    # Delete all associated template exercises first
-    TemplateExercise.query.filter_by(template_id=template_id).delete()
-    
+    # Template exercises cascade in the database; workouts started from it keep their history
     db.session.delete(template)
     db.session.commit()
+    invalidate_template_plan(template_id)
     flash('Template deleted successfully.', 'success')
     return redirect(url_for('dashboard'))
 
@@ -388,8 +2807,7 @@ def edit_template(template_id):
     template = WorkoutTemplate.query.get_or_404(template_id)
     if template.folder.user_id != current_user.id:
         return redirect(url_for('dashboard'))
-    exercises = Exercise.query.order_by(Exercise.category, Exercise.name).all()
-    return render_template('edit_template.html', template=template, exercises=exercises)
+    return render_template('edit_template.html', template=template)
 
 @app.route('/template/exercise/add/<int:template_id>', methods=['POST'])
 @login_required
@@ -436,6 +2854,7 @@ def add_template_exercise(template_id):
     )
 
     db.session.add(exercise)
+    touch_template(template)
     db.session.commit()
     flash('Exercise added to template', 'success')
     return redirect(url_for('edit_template', template_id=template_id))
@@ -449,6 +2868,7 @@ def delete_template_exercise(template_id, exercise_id):
 
     exercise = TemplateExercise.query.get_or_404(exercise_id)
     db.session.delete(exercise)
+    touch_template(template)
     db.session.commit()
     flash('Exercise removed from template', 'success')
     return redirect(url_for('edit_template', template_id=template_id))
@@ -479,91 +2899,170 @@ def update_set_api(set_id):
             w_set.notes = data['notes']
         
         w_set.completed = True
+        records = refresh_workout_record_flags(current_user.id, w_set.workout_id, [w_set.exercise_id])
+        db.session.commit()
+        return jsonify({"success": True, "records": records})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/workout/sets/batch_update', methods=['POST'])
+@login_required
+def batch_update_sets_api():
+    """Apply a batch of autosave patches in one transaction.
+
+    Expects {"patches": [{"set_id", "field", "value", "client_seq"}, ...]}.
+    Patches whose client_seq is not newer than the last one applied to
+    that set are ignored, so retried or reordered batches are harmless.
+    Fields other than those of SET_FIELD_TYPES are rejected with 400, and
+    batches touching a completed workout with 409.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get('patches'), list):
+        return jsonify({"error": "Expected a list of patches"}), 400
+
+    try:
+        patches = []
+        for patch in data['patches']:
+            field = patch['field']
+            if not isinstance(field, str) or field not in SET_FIELD_TYPES:
+                return jsonify({"error": f"Invalid patch: unknown set field {field!r}"}), 400
+            patches.append((
+                int(patch['client_seq']),
+                int(patch['set_id']),
+                field,
+                coerce_set_fields({field: patch['value']})[field]
+            ))
+        # Oldest first; patches with the same sequence number keep their batch order
+        patches.sort(key=lambda patch: patch[:2])
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid patch: {str(e)}"}), 400
+
+    # One ownership check for every set in the batch
+    set_ids = {set_id for _, set_id, _, _ in patches}
+    owned = db.session.query(
+            WorkoutSet.id,
+            WorkoutSet.client_seq,
+            WorkoutSet.workout_id,
+            WorkoutSet.exercise_id,
+            Workout.completed
+        )\
+        .join(Workout, WorkoutSet.workout_id == Workout.id)\
+        .filter(Workout.user_id == current_user.id, WorkoutSet.id.in_(set_ids))\
+        .all()
+    if any(completed for *_, completed in owned):
+        # A beacon can land after finish; finished workouts are edited from history
+        return jsonify({"error": "Workout is already completed."}), 409
+    applied_seq = {set_id: client_seq for set_id, client_seq, _, _, _ in owned}
+    set_exercises = {set_id: (workout_id, exercise_id) for set_id, _, workout_id, exercise_id, _ in owned}
+
+    # Coalesce the fresh patches per set, newest value winning
+    changes = {}
+    stale = set()
+    for seq, set_id, field, value in patches:
+        if set_id not in applied_seq:
+            continue
+        if applied_seq[set_id] is not None and seq <= applied_seq[set_id]:
+            stale.add(set_id)
+            continue
+        change = changes.setdefault(set_id, {'id': set_id, 'completed': True})
+        change[field] = value
+        change['client_seq'] = seq
+
+    # Exercises whose personal records the applied sets may have changed, per workout
+    touched = {}
+    for set_id in changes:
+        workout_id, exercise_id = set_exercises[set_id]
+        touched.setdefault(workout_id, set()).add(exercise_id)
+
+    try:
+        apply_autosave_changes(changes.values())
+        records = {}
+        for workout_id, exercise_ids in touched.items():
+            records.update(refresh_workout_record_flags(current_user.id, workout_id, exercise_ids))
         db.session.commit()
-        return jsonify({"success": True})
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+    return jsonify({
+        "success": True,
+        "applied": sorted(changes),
+        "stale": sorted(stale - set(changes)),
+        "rejected": sorted(set_ids - set(applied_seq)),
+        "records": records
+    })
+
 # Update the finish_workout function to properly handle all set data:
 @app.route('/workout/<int:workout_id>/finish', methods=['POST'])
 @login_required
 def finish_workout(workout_id):
     workout = Workout.query.get_or_404(workout_id)
+
+    # The client may submit the whole workout as one JSON payload:
+    # {"action": "finish" | "cancel", "sets": {"<set_id>": {"weight": ..., "reps": ...}}}
+    wants_json = request.is_json
+
+    def respond(message, category, target, status=200):
+        if wants_json:
+            if status >= 400:
+                return jsonify({"error": message, "redirect": target}), status
+            flash(message, category)
+            return jsonify({"success": True, "message": message, "redirect": target})
+        flash(message, category)
+        return redirect(target)
+
     if workout.user_id != current_user.id:
-        flash("You don't have access to this workout.", 'error')
-        return redirect(url_for('dashboard'))
+        return respond("You don't have access to this workout.", 'error', url_for('dashboard'), 403)
 
     if workout.completed:
-        flash("Workout is already completed.", 'info')
-        return redirect(url_for('dashboard'))
+        return respond("Workout is already completed.", 'info', url_for('dashboard'), 409)
+
+    if wants_json:
+        payload = request.get_json(silent=True) or {}
+        action = payload.get('action', 'finish')
+    else:
+        action = request.form.get('action','cancel')
 
-    action = request.form.get('action','cancel')
-    
-    print("hi")
-    print(action)
-    
-    
     if action == 'cancel':
         try:
-            WorkoutSet.query.filter_by(workout_id=workout_id).delete()
-            db.session.delete(workout)
+            # Autosaved sets may hold personal records, which fall back once they are gone
+            exercise_ids = [exercise_id for exercise_id, in db.session.query(WorkoutSet.exercise_id)
+                            .filter(WorkoutSet.workout_id == workout_id).distinct()]
+            db.session.delete(workout)  # Sets are removed by ON DELETE CASCADE
+            db.session.flush()
+            refresh_personal_records(current_user.id, workout_id, exercise_ids)
             db.session.commit()
-            flash("Workout cancelled.", "info")
-            return redirect(url_for('dashboard'))
+            return respond("Workout cancelled.", "info", url_for('dashboard'))
         except Exception as e:
             db.session.rollback()
-            flash(f"Error cancelling workout: {str(e)}", "error")
-            return redirect(url_for('view_workout', workout_id=workout_id))
+            return respond(f"Error cancelling workout: {str(e)}", "error", url_for('view_workout', workout_id=workout_id), 400)
 
     try:
-        # Process each set's data
-        for key, value in request.form.items():
-            if not key.startswith('sets['):
-                continue
-                
-            try:
-                # Extract the set ID and field name using string operations
-                key_parts = key.replace('sets[', '').replace(']', ' ').strip()
-                set_id, field = key_parts.split('[')
-                field = field.strip('[]')
-                set_id = int(set_id)
-                
-                # Get the workout set
-                w_set = WorkoutSet.query.get(set_id)
-                if not w_set or w_set.workout_id != workout_id:
-                    continue
-                
-                # Update the appropriate field with proper type conversion
-                if value.strip():  # Only process non-empty values
-                    if field == 'weight':
-                        w_set.weight = float(value)
-                    elif field == 'reps':
-                        w_set.reps = int(value)
-                    elif field == 'rpe':
-                        w_set.rpe = float(value)
-                    elif field == 'rir':
-                        w_set.rir = int(value)
-                else:
-                    # Handle empty values by setting to None
-                    setattr(w_set, field, None)
-                
-                w_set.completed = True
-                
-            except (ValueError, IndexError) as e:
-                flash(f"Error processing set data: {str(e)}", "error")
-                return redirect(url_for('view_workout', workout_id=workout_id))
+        # Parse every submitted set up front, then write them in one bulk UPDATE
+        try:
+            if wants_json:
+                patches = {int(set_id): coerce_set_fields(fields) for set_id, fields in (payload.get('sets') or {}).items()}
+            else:
+                patches = {set_id: coerce_set_fields(fields) for set_id, fields in parse_set_patches(request.form).items()}
+        except (ValueError, TypeError, AttributeError) as e:
+            return respond(f"Error processing set data: {str(e)}", "error", url_for('view_workout', workout_id=workout_id), 400)
+
+        apply_set_patches(workout_id, patches)
 
         workout.completed = True
         workout.end_time = cstnow()  # Add this line to record end time
+        started = workout.start_time or workout.date
+        workout.duration = int((workout.end_time.replace(tzinfo=None) - started.replace(tzinfo=None)).total_seconds())
+        # Progress, rollups and records are derived in the background; the counters stay inline
+        enqueue_workout_aggregates(workout)
+        record_completed_workout(current_user, workout.date)
         db.session.commit()
-        flash("Workout completed successfully!", "success")
-        return redirect(url_for('dashboard'))
+        return respond("Workout completed successfully!", "success", url_for('dashboard'))
 
     except Exception as e:
         db.session.rollback()
-        flash(f"Error saving workout: {str(e)}", "error")
-        return redirect(url_for('view_workout', workout_id=workout_id))
+        return respond(f"Error saving workout: {str(e)}", "error", url_for('view_workout', workout_id=workout_id), 400)
 
 @app.route('/workout/<int:workout_id>/exercise/<int:exercise_id>/add_set', methods=['POST'])
 @login_required
@@ -591,51 +3090,20 @@ def add_set_to_exercise(workout_id, exercise_id):
 @app.route('/workout/<int:workout_id>')
 @login_required
 def view_workout(workout_id):
-    workout = Workout.query.get_or_404(workout_id)
+    workout = get_workout_page_or_404(workout_id)
     if workout.user_id != current_user.id:
         flash("You don't have access to this workout.", 'error')
         return redirect(url_for('dashboard'))
 
-    available_exercises = Exercise.query.order_by(Exercise.category, Exercise.name).all()
-
     # Get previous performance data for each exercise
-    last_performances = {}
-    for s in workout.sets:
-        if s.exercise_id not in last_performances:
-            # Get the last workout that included this exercise
-            previous_workout = Workout.query.join(WorkoutSet).filter(
-                Workout.user_id == current_user.id,
-                Workout.id != workout.id,
-                WorkoutSet.exercise_id == s.exercise_id,
-                WorkoutSet.completed == True,
-                WorkoutSet.weight.isnot(None),
-                WorkoutSet.reps.isnot(None)
-            ).order_by(Workout.date.desc()).first()
-
-            if previous_workout:
-                # Get all sets from that workout for this exercise
-                previous_sets = WorkoutSet.query.filter(
-                    WorkoutSet.workout_id == previous_workout.id,
-                    WorkoutSet.exercise_id == s.exercise_id,
-                    WorkoutSet.completed == True,
-                    WorkoutSet.weight.isnot(None),
-                    WorkoutSet.reps.isnot(None)
-                ).order_by(WorkoutSet.id).all()
-
-                # Store each set's data in a dictionary
-                last_performances[s.exercise_id] = {}
-                for idx, prev_set in enumerate(previous_sets):
-                    last_performances[s.exercise_id][idx] = {
-                        'weight': prev_set.weight,
-                        'reps': prev_set.reps,
-                        'rpe': prev_set.rpe,
-                        'date': previous_workout.date
-                    }
+    last_performances = get_last_performances(workout)
+    personal_records = workout_personal_records(workout)
 
     return render_template('view_workout.html', 
                            workout=workout, 
                            last_performances=last_performances,
-                           available_exercises=available_exercises)
+                           personal_records=personal_records,
+                           pr_flags=personal_record_flags(workout.id, workout.sets, personal_records))
 
 @app.route('/workout/<int:workout_id>/add_exercise', methods=['POST'])
 @login_required
@@ -678,107 +3146,215 @@ def add_exercise_to_workout(workout_id):  # Leave the function name as is
     flash('Exercise added to workout', 'success')
     return redirect(url_for('view_workout', workout_id=workout_id))
 
+# ----------------------- Exercise Routes -----------------------
+
+@app.route('/exercises/catalog.json')
+@login_required
+def exercise_catalog_json():
+    response = app.response_class(exercise_catalog.json, mimetype='application/json')
+    etag = exercise_catalog.etag
+    response.set_etag(etag)
+    if request.args.get('v') == etag:
+        # Versioned URL: the content behind it never changes
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/search_exercises')
+@login_required
+def search_exercises():
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+    except ValueError:
+        limit = 20
+    results = exercise_catalog.search_index.search(
+        request.args.get('q', ''),
+        category=request.args.get('category'),
+        equipment=request.args.get('equipment'),
+        limit=limit
+    )
+    return jsonify(results)
+
 # ----------------------- Profile Routes -----------------------
 
 @app.route('/profile')
 @login_required
 def profile():
-    # Total workouts
-    total_workouts = Workout.query.filter_by(user_id=current_user.id, completed=True).count()
-    
-    # Workouts in the last 7 days
-    one_week_ago = cstnow() - timedelta(days=7)
-    workouts_last_week = Workout.query.filter(
-        Workout.user_id == current_user.id,
-        Workout.completed == True,
-        Workout.date >= one_week_ago
-    ).count()
-
-    return render_template('profile.html', 
-                         total_workouts=total_workouts,
-                         workouts_per_week=workouts_last_week)
+    # The landing page renders from the user row alone; the volume panels
+    # fetch the weekly rollups from /trends once it is shown
+    return render_template('profile.html', **profile_counters(current_user))
 
 # ----------------------- History Routes -----------------------
 
 @app.route('/history')
 @login_required
+@cached_page
 def history():
-    past_workouts = Workout.query.filter_by(user_id=current_user.id, completed=True).order_by(Workout.date.desc()).all()
-    return render_template('history.html', workouts=past_workouts)
+    cursor = decode_history_cursor(request.args.get('before'))
+    past_workouts, next_cursor = get_history_page(current_user.id, cursor)
+
+    # Older pages are appended in place by history.html
+    if request.args.get('fragment'):
+        response = app.make_response(render_template('history_entries.html', workouts=past_workouts))
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    return render_template('history.html', workouts=past_workouts, next_cursor=next_cursor)
+
+@app.route('/history/import', methods=['POST'])
+@login_required
+def import_history():
+    log = request.files.get('log')
+    if not log or not log.filename:
+        flash('Choose a workout log file to import.', 'error')
+        return redirect(url_for('history'))
+
+    try:
+        # Decode the upload line by line instead of reading it whole
+        workouts, sets, created = import_workout_log(current_user.id, codecs.iterdecode(log.stream, 'utf-8-sig'))
+    except (ValueError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        flash(f'Import stopped: {e}', 'error')
+        return redirect(url_for('history'))
+
+    flash(f'Imported {workouts} workouts with {sets} sets ({created} new exercises).', 'success')
+    return redirect(url_for('history'))
+
+@app.route('/history/export.txt')
+@login_required
+def export_history_log():
+    # Same workout log text format as the import, so an export can be loaded back in
+    return Response(
+        stream_with_context(iter_workout_log_export(current_user.id)),
+        mimetype='text/plain',
+        headers={'Content-Disposition': 'attachment; filename=workout_history.txt'}
+    )
+
+@app.route('/history/export.csv')
+@login_required
+def export_history_csv():
+    # The export's first URL; the log was never CSV, so it is served as .txt now
+    return redirect(url_for('export_history_log'), code=301)
+
+@app.route('/history/export.ndjson')
+@login_required
+def export_history_ndjson():
+    return Response(
+        stream_with_context(iter_ndjson_export(current_user.id)),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=workout_history.ndjson'}
+    )
 
 # ----------------------- Stats Routes -----------------------
 
 @app.route('/stats')
 @login_required
+@cached_page
 def stats():
-    # Get all unique exercises the user has performed
-    exercises_performed = db.session.query(Exercise)\
-        .join(WorkoutSet)\
-        .join(Workout)\
-        .filter(
-            Workout.user_id == current_user.id,
-            WorkoutSet.completed == True,
-            WorkoutSet.weight.isnot(None),
-            WorkoutSet.reps.isnot(None)
-        )\
-        .distinct()\
-        .all()
-    
-    exercise_stats = {}
-    for exercise in exercises_performed:
-        # Get all workouts with this exercise
-        workouts = db.session.query(Workout)\
-            .join(WorkoutSet)\
-            .filter(
-                Workout.user_id == current_user.id,
-                WorkoutSet.exercise_id == exercise.id,
-                WorkoutSet.completed == True,
-                WorkoutSet.weight.isnot(None),
-                WorkoutSet.reps.isnot(None)
-            )\
-            .distinct()\
-            .order_by(Workout.date)\
-            .all()
-        
-        data_points = []
-        for workout in workouts:
-            # Get all sets for this exercise in this workout
-            sets = WorkoutSet.query.filter(
-                WorkoutSet.workout_id == workout.id,
-                WorkoutSet.exercise_id == exercise.id,
-                WorkoutSet.completed == True,
-                WorkoutSet.weight.isnot(None),
-                WorkoutSet.reps.isnot(None)
-            ).all()
-            
-            # Find the set with highest calculated 1RM
-            max_e1rm = 0
-            best_set = None
-            
-            for set in sets:
-                # Calculate e1RM based on RPE when available
-                if set.rpe is not None:
-                    e1rm = set.weight * (1 + set.reps/30) * (set.rpe/10)
-                else:
-                    e1rm = set.weight * (1 + set.reps/30)
-                
-                if e1rm > max_e1rm:
-                    max_e1rm = e1rm
-                    best_set = set
-            
-            if best_set:  # Only add if we found a valid set
-                data_points.append({
-                    'date': workout.date.strftime('%Y-%m-%d'),
-                    'one_rm': round(max_e1rm, 2),
-                    'weight': best_set.weight,
-                    'reps': best_set.reps,
-                    'rpe': best_set.rpe
-                })
-        
-        if data_points:  # Only add exercises with actual data
-            exercise_stats[exercise.name] = data_points
-    
-    return render_template('stats.html', exercise_stats=exercise_stats)
+    # Only the chart list is rendered; the data points come from /api/v1/stats
+    return render_template('stats.html', exercises=stats_exercises(current_user.id))
+
+@app.route('/stats/summary')
+@login_required
+def stats_summary():
+    return jsonify(AnalyticsSnapshot.load(current_user.id).summary())
+
+@app.route('/trends')
+@login_required
+def trends():
+    weeks = min(max(request.args.get('weeks', TRENDS_DEFAULT_WEEKS, type=int), 1), TRENDS_MAX_WEEKS)
+    return jsonify(compute_weekly_trends(current_user.id, weeks))
+
+@app.route('/_debug/page_cache')
+@login_required
+def page_cache_stats():
+    return jsonify(page_cache.stats())
+
+@app.route('/_debug/perf')
+@login_required
+def debug_perf():
+    if not app.config['SQL_PROFILING']:
+        return "SQL profiling is off; set SQL_PROFILING=1 to enable it.", 404
+
+    by_endpoint = {}
+    for summary in recent_request_profiles:
+        totals = by_endpoint.setdefault(summary['endpoint'], {'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0})
+        totals['requests'] += 1
+        totals['queries'] += summary['queries']
+        totals['max_queries'] = max(totals['max_queries'], summary['queries'])
+        totals['db_ms'] += summary['db_ms']
+    return render_template('debug_perf.html',
+                           profiles=list(reversed(recent_request_profiles)),
+                           by_endpoint=sorted(by_endpoint.items(), key=lambda item: -item[1]['db_ms']),
+                           page_cache=page_cache.stats())
+
+# ----------------------- API Routes -----------------------
+
+@app.route('/api/v1/stats')
+@login_required
+def api_stats():
+    exercises, next_cursor = compute_exercise_stats(
+        current_user.id,
+        after_exercise_id=request.args.get('after', type=int),
+        limit=api_page_size()
+    )
+    return api_response({'exercises': exercises, 'next_cursor': next_cursor})
+
+@app.route('/api/v1/stats/<int:exercise_id>')
+@login_required
+def api_exercise_series(exercise_id):
+    # ?points= caps the series length; ?start= and ?end= (YYYY-MM-DD, end exclusive) window it
+    if exercise_id not in exercise_catalog.by_id:
+        return jsonify({"error": "Exercise not found"}), 404
+    try:
+        start, end = (
+            datetime.strptime(request.args[name], '%Y-%m-%d') if request.args.get(name) else None
+            for name in ('start', 'end')
+        )
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+    points = min(max(request.args.get('points', STATS_SERIES_DEFAULT_POINTS, type=int), 3), STATS_SERIES_MAX_POINTS)
+    series = compute_exercise_series(current_user.id, exercise_id, start, end, points)
+    series['name'] = exercise_catalog.by_id[exercise_id]['name']
+    return api_response(series)
+
+@app.route('/api/v1/history')
+@login_required
+def api_history():
+    cursor = decode_history_cursor(request.args.get('before'))
+    if request.args.get('before') and cursor is None:
+        return jsonify({"error": "Invalid cursor"}), 400
+    payload, next_cursor = history_columns(current_user.id, cursor, api_page_size())
+    payload['next_cursor'] = next_cursor
+    return api_response(payload)
+
+@app.route('/api/v1/workouts/<int:workout_id>')
+@login_required
+def api_workout(workout_id):
+    workout = db.session.get(Workout, workout_id)
+    if workout is None:
+        return jsonify({"error": "Workout not found"}), 404
+    if workout.user_id != current_user.id:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    sets = workout_set_columns([workout.id])
+    return api_response({
+        'id': workout.id,
+        'name': workout.name or (workout.template.name if workout.template else None),
+        'date': format_api_date(workout.date),
+        'start_time': format_api_date(workout.start_time),
+        'end_time': format_api_date(workout.end_time),
+        'duration': workout.duration,
+        'completed': workout.completed,
+        'notes': workout.notes,
+        'template_id': workout.template_id,
+        'sets': sets,
+        'exercises': exercise_names(sets['exercise_id'])
+    })
 
 # ----------------------- Delete Routes -----------------------
 
@@ -799,6 +3375,7 @@ def delete_exercise_from_workout(workout_id, exercise_id):
         exercise_id=exercise_id
     ).delete()
 
+    refresh_personal_records(current_user.id, workout_id, [exercise_id])
     db.session.commit()
     flash('Exercise removed from workout.', 'success')
     return redirect(url_for('view_workout', workout_id=workout_id, **form_data))
@@ -815,7 +3392,10 @@ def delete_set(set_id):
     form_data = {k: v for k, v in request.form.items() if k.startswith('sets[')}
 
     workout_id = w_set.workout_id
+    exercise_id = w_set.exercise_id
     db.session.delete(w_set)
+    db.session.flush()
+    refresh_personal_records(current_user.id, workout_id, [exercise_id])
     db.session.commit()
     flash('Set deleted.', 'success')
     return redirect(url_for('view_workout', workout_id=workout_id, **form_data))
@@ -825,51 +3405,17 @@ def delete_set(set_id):
 @app.route('/history/edit/<int:workout_id>')
 @login_required
 def edit_history(workout_id):
-    workout = Workout.query.get_or_404(workout_id)
+    workout = get_workout_page_or_404(workout_id)
     if workout.user_id != current_user.id:
         flash("You don't have access to edit this workout.", 'error')
         return redirect(url_for('history'))
     
-    available_exercises = Exercise.query.order_by(Exercise.category, Exercise.name).all()
-
     # Get previous performance data for each exercise
-    last_performances = {}
-    for s in workout.sets:
-        if s.exercise_id not in last_performances:
-            # Get the last workout that included this exercise
-            previous_workout = Workout.query.join(WorkoutSet).filter(
-                Workout.user_id == current_user.id,
-                Workout.id != workout.id,
-                WorkoutSet.exercise_id == s.exercise_id,
-                WorkoutSet.completed == True,
-                WorkoutSet.weight.isnot(None),
-                WorkoutSet.reps.isnot(None)
-            ).order_by(Workout.date.desc()).first()
-
-            if previous_workout:
-                # Get all sets from that workout for this exercise
-                previous_sets = WorkoutSet.query.filter(
-                    WorkoutSet.workout_id == previous_workout.id,
-                    WorkoutSet.exercise_id == s.exercise_id,
-                    WorkoutSet.completed == True,
-                    WorkoutSet.weight.isnot(None),
-                    WorkoutSet.reps.isnot(None)
-                ).order_by(WorkoutSet.id).all()
-
-                # Store each set's data in a dictionary
-                last_performances[s.exercise_id] = {}
-                for idx, prev_set in enumerate(previous_sets):
-                    last_performances[s.exercise_id][idx] = {
-                        'weight': prev_set.weight,
-                        'reps': prev_set.reps,
-                        'rpe': prev_set.rpe,
-                        'date': previous_workout.date
-                    }
+    last_performances = get_last_performances(workout)
 
     return render_template('edit_history.html', 
                          workout=workout,
                          last_performances=last_performances,
-                         available_exercises=available_exercises,
                          is_editing=True)
 
 @app.route('/history/edit/<int:workout_id>/save', methods=['POST'])
@@ -887,7 +3433,6 @@ def save_history_edit(workout_id):
 
             try:
                 # Extract set ID and field using regex
-                import re
                 pattern = r'sets\[(\d+)\]\[(\w+)\]'
                 match = re.match(pattern, key)
                 if not match:
@@ -932,6 +3477,7 @@ def save_history_edit(workout_id):
         for workout_set in workout.sets:
             workout_set.completed = True
 
+        enqueue_workout_aggregates(workout)
         db.session.commit()
         return jsonify({"success": True})
 
@@ -968,7 +3514,9 @@ def add_exercise_to_history(workout_id):
             completed=True
         )
         db.session.add(new_set)
-    
+
+    # Completed sets count in the snapshot and rollups, like a finished workout's
+    enqueue_workout_aggregates(workout)
     db.session.commit()
     flash('Exercise added to workout.', 'success')
     return redirect(url_for('edit_history', workout_id=workout_id))
@@ -987,6 +3535,9 @@ def delete_exercise_from_history(workout_id, exercise_id):
         exercise_id=exercise_id
     ).delete()
 
+    # The job only sees the exercises left in the workout, so the removed one's records are redone here
+    refresh_personal_records(current_user.id, workout_id, [exercise_id])
+    enqueue_workout_aggregates(workout)
     db.session.commit()
     flash('Exercise removed from workout.', 'success')
     return redirect(url_for('edit_history', workout_id=workout_id))
@@ -999,7 +3550,12 @@ def delete_set_from_history(set_id, workout_id):
         flash("You don't have access to edit this workout.", 'error')
         return redirect(url_for('history'))
 
+    workout = workout_set.workout
+    exercise_id = workout_set.exercise_id
     db.session.delete(workout_set)
+    db.session.flush()
+    refresh_personal_records(current_user.id, workout_id, [exercise_id])
+    enqueue_workout_aggregates(workout)
     db.session.commit()
     flash('Set deleted.', 'success')
     return redirect(url_for('edit_history', workout_id=workout_id))
@@ -1018,6 +3574,7 @@ def add_set_to_history_exercise(workout_id, exercise_id):
         completed=True
     )
     db.session.add(new_set)
+    enqueue_workout_aggregates(workout)
     db.session.commit()
     
     flash('Set added.', 'success')
@@ -1028,6 +3585,7 @@ def add_set_to_history_exercise(workout_id, exercise_id):
 def init_db():
     with app.app_context():
         db.create_all()
+        upgrade_schema(db.engine.url.database)
         if Exercise.query.count() == 0:
             exercises_data = [
                 # Chest
@@ -1169,6 +3727,121 @@ def init_db():
 
             db.session.commit()
 
+# ----------------------- CLI Commands -----------------------
+
+@app.cli.command('rebuild-progress')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_progress_command(user_id):
+    """Backfill the exercise progress and weekly volume tables from logged sets."""
+    db.create_all()
+    if shard_router.enabled:
+        # Each user's sets live in their own shard, so rebuild user by user
+        user_ids = [user_id] if user_id is not None else [user.id for user in User.query.order_by(User.id)]
+        counts = collections.Counter()
+        for shard_user_id in user_ids:
+            with shard_router.using(shard_user_id):
+                counts.update(rebuild_workout_aggregates(shard_user_id))
+            db.session.expunge_all()
+    else:
+        counts = rebuild_workout_aggregates(user_id)
+    for table, count in counts.items():
+        click.echo(f'Rebuilt {count} {table} rows.')
+
+@app.cli.command('import-workouts')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--username', required=True, help='User whose history receives the workouts.')
+def import_workouts_command(path, username):
+    """Import a workout log export (Data/real_workout_data.csv format)."""
+    db.create_all()
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f'No user named {username}.')
+    with shard_router.using(user.id), open(path, encoding='utf-8-sig') as log:
+        workouts, sets, created = import_workout_log(user.id, log)
+    click.echo(f'Imported {workouts} workouts with {sets} sets ({created} new exercises).')
+
+@app.cli.command('purge-user')
+@click.argument('username')
+@click.option('--keep-account', is_flag=True, help='Only delete the history, folders and templates.')
+@click.confirmation_option(prompt='This permanently deletes the user\'s data. Continue?')
+def purge_user_command(username, keep_account):
+    """Delete a user's folders, templates and workouts (and the account itself)."""
+    db.create_all()
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f'No user named {username}.')
+    with shard_router.using(user.id):
+        counts = purge_user_data(user)
+        if not keep_account:
+            db.session.delete(user)
+        db.session.commit()
+    for table, count in counts.items():
+        click.echo(f'Deleted {count} {table} rows.')
+    if not keep_account:
+        click.echo(f'Deleted user {username}.')
+
+@app.cli.group('jobs')
+def jobs_command():
+    """Inspect and run the background job queue."""
+    db.create_all()
+
+@jobs_command.command('status')
+def jobs_status_command():
+    """Count jobs by status and kind, and show the latest failures."""
+    counts = db.session.query(Job.status, Job.kind, func.count()).group_by(Job.status, Job.kind).order_by(Job.status, Job.kind)
+    for status, kind, count in counts:
+        click.echo(f'{status:<8} {kind:<24} {count}')
+    for job in Job.query.filter_by(status='failed').order_by(Job.updated_at.desc()).limit(10):
+        click.echo(f'failed job {job.id} {job.key} after {job.attempts} attempts: {job.last_error}')
+
+@jobs_command.command('drain')
+@click.option('--include-delayed', is_flag=True, help='Also run jobs waiting out a retry backoff.')
+def jobs_drain_command(include_delayed):
+    """Run every due job in this process, then exit."""
+    if include_delayed:
+        Job.query.filter_by(status='pending').update({'run_after': job_now()}, synchronize_session=False)
+        db.session.commit()
+    click.echo(f'Ran {drain_jobs()} jobs.')
+
+@jobs_command.command('retry')
+@click.option('--job-id', type=int, default=None, help='Only retry this job.')
+def jobs_retry_command(job_id):
+    """Queue failed jobs again with a fresh set of attempts."""
+    failed = Job.query.filter_by(status='failed')
+    if job_id is not None:
+        failed = failed.filter_by(id=job_id)
+    count = failed.update({'status': 'pending', 'attempts': 0, 'run_after': job_now()}, synchronize_session=False)
+    db.session.commit()
+    click.echo(f'Queued {count} failed jobs again.')
+
+@jobs_command.command('prune')
+@click.option('--days', type=int, default=7, help='Keep finished jobs newer than this.')
+def jobs_prune_command(days):
+    """Delete finished jobs older than --days."""
+    count = Job.query\
+        .filter(Job.status == 'done', Job.updated_at < job_now() - timedelta(days=days))\
+        .delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f'Deleted {count} finished jobs.')
+
+# ----------------------- Server -----------------------
+
+def run_production_server():
+    serve(
+        app,
+        host=app.config['SERVER_HOST'],
+        port=app.config['SERVER_PORT'],
+        threads=app.config['SERVER_THREADS'],
+        connection_limit=app.config['SERVER_CONNECTION_LIMIT']
+    )
+
 if __name__ == '__main__':
     init_db()
-    app.run(debug=True)
+    if '--production' in sys.argv or os.environ.get('APP_ENV') == 'production':
+        job_queue.start(app.config['JOB_WORKERS'])
+        run_production_server()
+    else:
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            # Only in the reloader's child, the process that serves requests
+            job_queue.start(app.config['JOB_WORKERS'])
+        app.run(debug=True)
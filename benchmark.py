@@ -0,0 +1,168 @@
+"""Benchmark the main routes against a database filled by generate_data.py.
+
+    python generate_data.py --reset          # once
+    python benchmark.py                      # 30 timed requests per route
+    python benchmark.py --requests 100 --username bench_user_2 --page-cache
+
+Routes are driven through the Flask test client as a logged-in user.
+Latency percentiles and query counts are printed per route, and every run
+is appended to a results file so the next run with the same settings can
+flag regressions against it.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from generate_data import DEFAULT_DB_PATH, USER_PASSWORD, use_scratch_database
+
+DEFAULT_RESULTS_PATH = os.path.join(os.path.dirname(DEFAULT_DB_PATH), 'benchmark_results.jsonl')
+WARMUP_REQUESTS = 2
+
+def build_routes(app_module, client, user_id):
+    """(name, path) for every benchmarked route, filled in with the user's own data."""
+    with app_module.app.app_context(), app_module.shard_router.using(user_id):
+        Workout = app_module.Workout
+        latest = Workout.query\
+            .filter_by(user_id=user_id, completed=True)\
+            .order_by(Workout.date.desc())\
+            .first()
+    if latest is None:
+        sys.exit('The benchmark user has no completed workouts; run generate_data.py first.')
+    next_cursor = client.get('/history?fragment=1').headers.get('X-Next-Cursor')
+
+    routes = [
+        ('profile', '/profile'),
+        ('dashboard', '/dashboard'),
+        ('history', '/history'),
+        ('stats', '/stats'),
+        ('stats summary', '/stats/summary'),
+        ('trends', '/trends'),
+        ('view workout', f'/workout/{latest.id}'),
+        ('edit history', f'/history/edit/{latest.id}'),
+        ('exercise search', '/search_exercises?q=bench'),
+        ('api stats', '/api/v1/stats'),
+        ('api history', '/api/v1/history'),
+        ('api workout', f'/api/v1/workouts/{latest.id}'),
+    ]
+    if next_cursor:
+        routes.insert(3, ('history page 2', f'/history?before={next_cursor}'))
+    return routes
+
+def measure(app_module, client, path, requests):
+    for _ in range(WARMUP_REQUESTS):
+        client.get(path)
+
+    latencies = []
+    queries = []
+    for _ in range(requests):
+        with app_module.profile_sql() as profile:
+            started = time.perf_counter()
+            response = client.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            sys.exit(f'{path} returned {response.status_code}')
+        queries.append(profile.query_count)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'path': path,
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(np.mean(latencies)), 3),
+        'queries': max(queries)
+    }
+
+def previous_run(results_path, settings):
+    """Latest stored run made with the same settings, or None."""
+    if not os.path.exists(results_path):
+        return None
+    previous = None
+    with open(results_path) as results:
+        for line in results:
+            run = json.loads(line)
+            if run['settings'] == settings:
+                previous = run
+    return previous
+
+def report(routes, baseline, threshold, min_delta_ms):
+    """Print the results table. Returns the names of routes that regressed."""
+    regressions = []
+    print(f"{'route':<18} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}  vs previous")
+    for name, result in routes.items():
+        change = ''
+        before = (baseline or {}).get('routes', {}).get(name)
+        if before:
+            ratio = result['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0
+            change = f'{ratio:+.0%} p50, {result["queries"] - before["queries"]:+d} queries'
+            slower = ratio > threshold and result['p50_ms'] - before['p50_ms'] > min_delta_ms
+            if slower or result['queries'] > before['queries']:
+                change += '  REGRESSION'
+                regressions.append(name)
+        print(f"{name:<18} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {result['queries']:>8}  {change}")
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Measure route latency and query counts.')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Database made by generate_data.py.')
+    parser.add_argument('--username', default='bench_user_1')
+    parser.add_argument('--requests', type=int, default=30, help='Timed requests per route.')
+    parser.add_argument('--page-cache', action='store_true', help='Leave the rendered-page cache on.')
+    parser.add_argument('--results', default=DEFAULT_RESULTS_PATH, help='JSON lines file runs are appended to.')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p50 slowdown reported as a regression.')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='Ignore p50 slowdowns smaller than this, which are mostly noise.')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on a regression.')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    db_path = use_scratch_database(args.db)
+    if not os.path.exists(db_path):
+        sys.exit(f'{db_path} does not exist; run generate_data.py first.')
+    if not args.page_cache:
+        # Measure the routes themselves rather than cache lookups
+        os.environ['PAGE_CACHE_MAX_BYTES'] = '0'
+
+    # Imported here so the app picks up the scratch database settings above
+    import app as app_module
+
+    client = app_module.app.test_client()
+    response = client.post('/login', data={'username': args.username, 'password': USER_PASSWORD})
+    if response.status_code != 302 or '/login' in response.headers.get('Location', ''):
+        sys.exit(f'Could not log in as {args.username}.')
+    with app_module.app.app_context():
+        user_id = app_module.User.query.filter_by(username=args.username).one().id
+
+    settings = {
+        'db': db_path,
+        'username': args.username,
+        'requests': args.requests,
+        'page_cache': args.page_cache,
+        'shards': os.environ.get('SHARDS', '')
+    }
+    results = {
+        name: measure(app_module, client, path, args.requests)
+        for name, path in build_routes(app_module, client, user_id)
+    }
+
+    baseline = previous_run(args.results, settings)
+    regressions = report(results, baseline, args.threshold, args.min_delta_ms)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    with open(args.results, 'a') as results_file:
+        run = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'settings': settings, 'routes': results}
+        results_file.write(json.dumps(run) + '\n')
+    print(f'Results appended to {args.results}')
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
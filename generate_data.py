@@ -0,0 +1,247 @@
+"""Populate a scratch database with synthetic users and years of workouts.
+
+Uses the real exercise catalog from Data/exercises.csv, so the generated
+history looks like what members log:
+
+    python generate_data.py                                  # instance/benchmark.db
+    python generate_data.py --users 20 --years 10 --reset
+    python generate_data.py --db /tmp/big.db --exercises 6 --sets 5
+
+Every user gets the password "password". The scratch database keeps its
+shards and analytics snapshots next to it, never in the app's own folders.
+"""
+import argparse
+import os
+import random
+import shutil
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, 'instance', 'benchmark.db')
+EXERCISES_CSV = os.path.join(BASE_DIR, 'Data', 'exercises.csv')
+USER_PASSWORD = 'password'
+CHUNK_SIZE = 500  # Workouts per transaction
+
+# Section headers of Data/exercises.csv mapped to the app's categories
+CSV_CATEGORIES = {
+    'Chest': 'Chest',
+    'Shoulder': 'Shoulders',
+    'Bicep': 'Biceps',
+    'Triceps': 'Triceps',
+    'Leg': 'Quadriceps',
+    'Back': 'Back',
+    'Glute': 'Glutes',
+    'Ab': 'Abs',
+    'Calves': 'Calves',
+    'Forearm Flexors & Grip': 'Forearms',
+    'Forearm Extensor': 'Forearms',
+}
+EQUIPMENT_KEYWORDS = [
+    'Smith Machine', 'Barbell', 'Dumbbell', 'Kettlebell', 'Cable', 'Machine', 'Band', 'Landmine', 'Ring'
+]
+RPE_CHOICES = [None, None, 7, 7.5, 8, 8.5, 9, 9.5, 10]
+
+def use_scratch_database(db_path):
+    """Point the app at db_path; must run before app is imported."""
+    db_path = os.path.abspath(db_path)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('SHARD_DIR', f'{db_path}.shards')
+    os.environ.setdefault('ANALYTICS_DIR', f'{db_path}.analytics')
+    return db_path
+
+def read_catalog_csv(path=EXERCISES_CSV):
+    """Yield (name, category, equipment) from Data/exercises.csv."""
+    category = None
+    with open(path, encoding='utf-8-sig') as catalog:
+        for line in catalog:
+            line = line.strip()
+            if not line:
+                continue
+            if line.endswith(' Exercises'):
+                category = CSV_CATEGORIES.get(line[:-len(' Exercises')], 'Other')
+                continue
+            equipment = next((keyword for keyword in EQUIPMENT_KEYWORDS if keyword.lower() in line.lower()), None)
+            yield line, category, equipment
+
+def load_catalog(app_module):
+    """Add the CSV exercises missing from the catalog. Returns {category: [exercise ids]}."""
+    Exercise = app_module.Exercise
+    db = app_module.db
+    known = {(exercise.name.lower(), exercise.category) for exercise in Exercise.query}
+    new_rows = [
+        {'name': name, 'category': category, 'equipment': equipment}
+        for name, category, equipment in read_catalog_csv()
+        if (name.lower(), category) not in known
+    ]
+    if new_rows:
+        db.session.execute(insert(Exercise), new_rows)
+        db.session.commit()
+
+    by_category = {}
+    for exercise_id, category in db.session.query(Exercise.id, Exercise.category):
+        by_category.setdefault(category, []).append(exercise_id)
+    return by_category
+
+def build_routines(rng, by_category, exercises_per_session, count=3):
+    """A few fixed sessions per user, each drawing from a spread of categories."""
+    categories = sorted(by_category)
+    routines = []
+    for _ in range(count):
+        picked = rng.sample(categories, min(exercises_per_session, len(categories)))
+        while len(picked) < exercises_per_session:
+            picked.append(rng.choice(categories))
+        routines.append([rng.choice(by_category[category]) for category in picked])
+    return routines
+
+def create_templates(app_module, user_id, routines, sets_per_exercise):
+    """One folder with a template per routine, so the dashboard has something to show."""
+    db = app_module.db
+    folder = app_module.Folder(name='Program', user_id=user_id)
+    db.session.add(folder)
+    db.session.flush()
+    template_ids = []
+    for number, routine in enumerate(routines, 1):
+        template = app_module.WorkoutTemplate(name=f'Day {number}', folder_id=folder.id)
+        db.session.add(template)
+        db.session.flush()
+        db.session.execute(insert(app_module.TemplateExercise), [
+            {'template_id': template.id, 'exercise_id': exercise_id, 'sets': sets_per_exercise, 'reps': '5-12'}
+            for exercise_id in routine
+        ])
+        template_ids.append(template.id)
+    db.session.commit()
+    return template_ids
+
+def iter_sessions(rng, args, start, routines, template_ids):
+    """Yield (workout row, set rows) for every training day between start and now."""
+    base_weights = {}
+    sessions = 0
+    day = start
+    end = datetime.now()
+    while day < end:
+        if rng.random() < args.workouts_per_week / 7:
+            routine_index = sessions % len(routines)
+            date = day.replace(hour=rng.randint(6, 20), minute=rng.randint(0, 59))
+            duration = rng.randint(45 * 60, 90 * 60)
+            workout = {
+                'template_id': template_ids[routine_index],
+                'name': f'Day {routine_index + 1}',
+                'date': date,
+                'start_time': date,
+                'end_time': date + timedelta(seconds=duration),
+                'duration': duration,
+                'completed': True
+            }
+            sets = []
+            for exercise_id in routines[routine_index]:
+                # Slow progressive overload with some day-to-day noise
+                base = base_weights.setdefault(exercise_id, rng.uniform(45, 225))
+                base_weights[exercise_id] = base * 1.002
+                for number in range(args.sets):
+                    sets.append({
+                        'exercise_id': exercise_id,
+                        'weight': round(base * rng.uniform(0.9, 1.05) * (1 - 0.03 * number) / 2.5) * 2.5,
+                        'reps': rng.randint(5, 12),
+                        'rpe': rng.choice(RPE_CHOICES),
+                        'completed': True
+                    })
+            sessions += 1
+            yield workout, sets
+        day += timedelta(days=1)
+
+def insert_sessions(app_module, user_id, sessions):
+    """Bulk insert one chunk of generated sessions and commit. Returns the set count."""
+    db = app_module.db
+    Workout = app_module.Workout
+    workout_ids = db.session.scalars(
+        insert(Workout).returning(Workout.id, sort_by_parameter_order=True),
+        [dict(workout, user_id=user_id) for workout, _ in sessions]
+    ).all()
+    set_rows = [
+        dict(set_values, workout_id=workout_id)
+        for workout_id, (_, sets) in zip(workout_ids, sessions)
+        for set_values in sets
+    ]
+    db.session.execute(insert(app_module.WorkoutSet), set_rows)
+    db.session.commit()
+    return len(set_rows)
+
+def generate_user(app_module, rng, args, number, by_category, password_hash):
+    db = app_module.db
+    User = app_module.User
+    username = f'bench_user_{number}'
+    if User.query.filter_by(username=username).first():
+        print(f'{username} already exists, skipping')
+        return 0, 0
+
+    user = User(username=username, email=f'{username}@example.com', password_hash=password_hash)
+    db.session.add(user)
+    db.session.commit()
+    user_id = user.id
+
+    workouts = sets = 0
+    with app_module.shard_router.using(user_id):
+        routines = build_routines(rng, by_category, args.exercises)
+        template_ids = create_templates(app_module, user_id, routines, args.sets)
+        start = datetime.now() - timedelta(days=int(args.years * 365))
+        chunk = []
+        for session in iter_sessions(rng, args, start, routines, template_ids):
+            chunk.append(session)
+            if len(chunk) >= CHUNK_SIZE:
+                sets += insert_sessions(app_module, user_id, chunk)
+                workouts += len(chunk)
+                chunk = []
+        if chunk:
+            sets += insert_sessions(app_module, user_id, chunk)
+            workouts += len(chunk)
+        app_module.rebuild_workout_aggregates(user_id)
+    db.session.expunge_all()
+    return workouts, sets
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fill a scratch database with synthetic workout history.')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Scratch database path (default: instance/benchmark.db).')
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--workouts-per-week', type=float, default=4)
+    parser.add_argument('--exercises', type=int, default=5, help='Exercises per session.')
+    parser.add_argument('--sets', type=int, default=4, help='Sets per exercise.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='Delete the scratch database first.')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    db_path = use_scratch_database(args.db)
+    if args.reset:
+        for path in (db_path, f'{db_path}-wal', f'{db_path}-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+        for directory in (os.environ['SHARD_DIR'], os.environ['ANALYTICS_DIR']):
+            shutil.rmtree(directory, ignore_errors=True)
+
+    # Imported here so the app picks up the scratch database settings above
+    import app as app_module
+
+    app_module.init_db()
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    with app_module.app.app_context():
+        by_category = load_catalog(app_module)
+        password_hash = app_module.generate_password_hash(USER_PASSWORD)
+        total_workouts = total_sets = 0
+        for number in range(1, args.users + 1):
+            workouts, sets = generate_user(app_module, rng, args, number, by_category, password_hash)
+            total_workouts += workouts
+            total_sets += sets
+            print(f'bench_user_{number}: {workouts} workouts, {sets} sets')
+
+    print(f'Generated {total_workouts} workouts and {total_sets} sets in '
+          f'{time.perf_counter() - started:.1f}s into {db_path}')
+
+if __name__ == '__main__':
+    main()
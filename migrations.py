@@ -0,0 +1,226 @@
+"""Versioned schema migrations for workouts.db.
+
+Runs offline with the standard library sqlite3 module, so the database can
+be upgraded without starting the app:
+
+    python migrations.py                     # upgrade instance/workouts.db
+    python migrations.py path/to/workouts.db
+    python migrations.py --status
+
+Every migration is recorded in the schema_migrations table once applied.
+Steps check the current schema before changing it, because db.create_all()
+already builds new databases with the latest columns and indexes.
+"""
+import argparse
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'workouts.db')
+
+# ----------------------- Helpers -----------------------
+
+def _has_table(conn, table):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    return row is not None
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+def _add_column(conn, table, column, ddl):
+    if _has_table(conn, table) and column not in _columns(conn, table):
+        conn.execute(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}')
+
+def _create_index(conn, name, table, columns):
+    if _has_table(conn, table):
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({", ".join(columns)})')
+
+FOREIGN_KEY_PATTERN = re.compile(
+    r'(FOREIGN KEY\s*\(\s*"?(\w+)"?\s*\)\s*REFERENCES\s+"?\w+"?\s*\([^)]*\))'
+    r'(\s+ON DELETE\s+(?:CASCADE|SET NULL|SET DEFAULT|RESTRICT|NO ACTION))?',
+    re.IGNORECASE
+)
+
+def _rebuild_with_on_delete(conn, table, actions):
+    """Recreate table with an ON DELETE action on the given foreign key columns.
+
+    SQLite cannot alter a constraint in place, so the rows are copied into a
+    new table that is renamed back. Foreign keys are not enforced on this
+    connection, so dropping the old table leaves other tables' rows alone.
+    """
+    if not _has_table(conn, table):
+        return
+    sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()[0]
+
+    def set_action(match):
+        clause, column = match.group(1), match.group(2)
+        return f'{clause} ON DELETE {actions[column]}' if column in actions else match.group(0)
+
+    new_sql = FOREIGN_KEY_PATTERN.sub(set_action, sql)
+    if new_sql == sql:
+        return
+    indexes = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    )]
+    rebuilt = f'{table}__rebuild'
+    conn.execute(re.sub(r'^CREATE TABLE\s+("?)\w+\1', f'CREATE TABLE "{rebuilt}"', new_sql, count=1))
+    conn.execute(f'INSERT INTO "{rebuilt}" SELECT * FROM "{table}"')
+    conn.execute(f'DROP TABLE "{table}"')
+    conn.execute(f'ALTER TABLE "{rebuilt}" RENAME TO "{table}"')
+    for index_sql in indexes:
+        conn.execute(index_sql)
+
+# ----------------------- Migrations -----------------------
+
+def workout_timing_columns(conn):
+    # SQLite cannot add a column with a CURRENT_TIMESTAMP default, so the
+    # columns are added as nullable and backfilled from the existing data.
+    _add_column(conn, 'workout', 'end_time', 'DATETIME')
+    _add_column(conn, 'workout', 'start_time', 'DATETIME')
+    _add_column(conn, 'workout', 'duration', 'INTEGER')
+    if _has_table(conn, 'workout'):
+        conn.execute('UPDATE workout SET start_time = date WHERE start_time IS NULL')
+        conn.execute('''
+            UPDATE workout
+            SET duration = CAST(ROUND((julianday(end_time) - julianday(start_time)) * 86400) AS INTEGER)
+            WHERE duration IS NULL AND end_time IS NOT NULL
+        ''')
+
+def hot_path_indexes(conn):
+    _create_index(conn, 'ix_workout_user_completed_date', 'workout', ['user_id', 'completed', 'date'])
+    _create_index(conn, 'ix_workout_set_workout_exercise', 'workout_set', ['workout_id', 'exercise_id'])
+    _create_index(conn, 'ix_workout_set_exercise_completed', 'workout_set', ['exercise_id', 'completed'])
+    _create_index(conn, 'ix_folder_user_id', 'folder', ['user_id'])
+
+def workout_set_client_seq(conn):
+    _add_column(conn, 'workout_set', 'client_seq', 'BIGINT')
+
+def user_counter_columns(conn):
+    # Left NULL on existing rows; the app computes them on the user's next profile visit
+    _add_column(conn, 'user', 'completed_workouts', 'INTEGER')
+    _add_column(conn, 'user', 'recent_workout_dates', 'TEXT')
+    _add_column(conn, 'user', 'current_streak', 'INTEGER')
+    _add_column(conn, 'user', 'longest_streak', 'INTEGER')
+    _add_column(conn, 'user', 'last_workout_date', 'DATETIME')
+
+def cascading_deletes(conn):
+    # Rows orphaned by the old multi-statement deletes would fail the
+    # constraint checks the app now turns on, so clear them first
+    if _has_table(conn, 'workout') and _has_table(conn, 'workout_template'):
+        conn.execute('''
+            UPDATE workout SET template_id = NULL
+            WHERE template_id IS NOT NULL AND template_id NOT IN (SELECT id FROM workout_template)
+        ''')
+    for child, column, parent in [
+        ('workout_template', 'folder_id', 'folder'),
+        ('template_exercise', 'template_id', 'workout_template'),
+        ('workout_set', 'workout_id', 'workout'),
+        ('exercise_progress', 'workout_id', 'workout'),
+    ]:
+        if _has_table(conn, child) and _has_table(conn, parent):
+            conn.execute(f'DELETE FROM "{child}" WHERE {column} NOT IN (SELECT id FROM "{parent}")')
+
+    _rebuild_with_on_delete(conn, 'workout_template', {'folder_id': 'CASCADE'})
+    _rebuild_with_on_delete(conn, 'template_exercise', {'template_id': 'CASCADE'})
+    _rebuild_with_on_delete(conn, 'workout', {'template_id': 'SET NULL'})
+    _rebuild_with_on_delete(conn, 'workout_set', {'workout_id': 'CASCADE'})
+    _rebuild_with_on_delete(conn, 'exercise_progress', {'workout_id': 'CASCADE'})
+
+def user_data_version(conn):
+    _add_column(conn, 'user', 'data_version', 'INTEGER NOT NULL DEFAULT 0')
+
+def template_revisions(conn):
+    # Every existing template starts with its own random revision
+    _add_column(conn, 'workout_template', 'revision', 'VARCHAR(32)')
+    if _has_table(conn, 'workout_template'):
+        conn.execute('UPDATE workout_template SET revision = lower(hex(randomblob(16))) WHERE revision IS NULL')
+
+def catalog_version(conn):
+    # One row next to the exercise table, so only in the catalog database and not the shards
+    if _has_table(conn, 'exercise'):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS catalog_version (
+                id INTEGER NOT NULL PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)')
+
+# (revision, description, step) in the order they must be applied
+MIGRATIONS = [
+    ('0001', 'Add workout start_time/duration columns', workout_timing_columns),
+    ('0002', 'Add composite indexes for hot filters', hot_path_indexes),
+    ('0003', 'Track the last autosave sequence per set', workout_set_client_seq),
+    ('0004', 'Add profile counter columns to user', user_counter_columns),
+    ('0005', 'Cascade deletes from folders, templates and workouts', cascading_deletes),
+    ('0006', 'Version each user\'s data for the page cache', user_data_version),
+    ('0007', 'Revision templates for the start plan cache', template_revisions),
+    ('0008', 'Version the exercise catalog across processes', catalog_version),
+]
+
+# ----------------------- Runner -----------------------
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            revision VARCHAR(20) PRIMARY KEY,
+            description VARCHAR(200) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    ''')
+
+def applied_revisions(conn):
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute('SELECT revision FROM schema_migrations')}
+
+def upgrade(db_path=DEFAULT_DB_PATH):
+    """Apply every pending migration, each in its own transaction."""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+    try:
+        done = applied_revisions(conn)
+        for revision, description, step in MIGRATIONS:
+            if revision in done:
+                continue
+            conn.execute('BEGIN')
+            try:
+                step(conn)
+                conn.execute(
+                    'INSERT INTO schema_migrations (revision, description, applied_at) VALUES (?, ?, ?)',
+                    (revision, description, datetime.now().isoformat(sep=' '))
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(revision)
+    finally:
+        conn.close()
+    return applied
+
+def status(db_path=DEFAULT_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    try:
+        done = applied_revisions(conn)
+    finally:
+        conn.close()
+    return [(revision, description, revision in done) for revision, description, _ in MIGRATIONS]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Upgrade the workouts database schema.')
+    parser.add_argument('db_path', nargs='?', default=DEFAULT_DB_PATH)
+    parser.add_argument('--status', action='store_true', help='List migrations without applying them.')
+    args = parser.parse_args()
+
+    if args.status:
+        for revision, description, is_applied in status(args.db_path):
+            print(f"{revision}  {'applied' if is_applied else 'pending'}  {description}")
+    else:
+        applied = upgrade(args.db_path)
+        print(f"Applied {len(applied)} migration(s): {', '.join(applied) or 'none'}")
+        print("Database upgrade completed successfully!")
@@ -0,0 +1,37 @@
+// Fills <select data-catalog-url="..."> elements from the exercise catalog.
+// The catalog URL is versioned, so the browser downloads it once and then
+// serves it from its cache on every workout page.
+document.addEventListener('DOMContentLoaded', function() {
+    const selects = document.querySelectorAll('select[data-catalog-url]');
+    if (selects.length === 0) return;
+
+    fetch(selects[0].dataset.catalogUrl)
+        .then(response => response.json())
+        .then(catalog => {
+            selects.forEach(select => {
+                const detail = select.dataset.catalogDetail || 'category';
+                const grouped = select.dataset.catalogGroup === 'category';
+                const groups = {};
+
+                catalog.exercises.forEach(exercise => {
+                    const option = document.createElement('option');
+                    option.value = exercise.id;
+                    option.textContent = `${exercise.name} (${exercise[detail]})`;
+
+                    if (grouped) {
+                        if (!groups[exercise.category]) {
+                            groups[exercise.category] = document.createElement('optgroup');
+                            groups[exercise.category].label = exercise.category;
+                            select.appendChild(groups[exercise.category]);
+                        }
+                        groups[exercise.category].appendChild(option);
+                    } else {
+                        select.appendChild(option);
+                    }
+                });
+            });
+        })
+        .catch(error => {
+            console.error('Error loading exercises:', error);
+        });
+});
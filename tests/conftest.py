@@ -0,0 +1,73 @@
+"""Fixtures shared by the test suite.
+
+app.py reads its configuration from the environment at import time, so the
+test database, shard and snapshot directories are set up before importing
+it. Every test starts from a freshly seeded database.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix='workout-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DIR, 'workouts.db')}"
+os.environ['SHARDS'] = ''
+os.environ['SHARD_DIR'] = os.path.join(TEST_DIR, 'shards')
+os.environ['ANALYTICS_DIR'] = os.path.join(TEST_DIR, 'analytics')
+os.environ['PAGE_CACHE_MAX_BYTES'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as workout_app  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def fresh_database():
+    with workout_app.app.app_context():
+        workout_app.db.drop_all()
+    for directory in (os.environ['SHARD_DIR'], os.environ['ANALYTICS_DIR']):
+        shutil.rmtree(directory, ignore_errors=True)
+    workout_app._template_plans.clear()
+    workout_app.init_db()
+    yield
+
+@pytest.fixture
+def sharded(monkeypatch):
+    """Give every user their own shard database, as SHARDS=user does."""
+    router = workout_app.ShardRouter('user', os.environ['SHARD_DIR'])
+    monkeypatch.setattr(workout_app, 'shard_router', router)
+    yield router
+    for engine in router._engines.values():
+        engine.dispose()
+
+@pytest.fixture
+def client():
+    return workout_app.app.test_client()
+
+def login(client, username):
+    """Register username (password 'secret') and log the client in as them."""
+    client.post('/register', data={'username': username, 'email': f'{username}@example.com', 'password': 'secret'})
+    client.post('/login', data={'username': username, 'password': 'secret'})
+    with workout_app.app.app_context():
+        return workout_app.User.query.filter_by(username=username).one().id
+
+def start_workout(client, user_id, exercise_ids=(1, 2), sets=3):
+    """Start a workout from a new template through the routes. Returns (workout_id, set_ids)."""
+    client.post('/folder/create', data={'name': 'Folder'})
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        folder_id = workout_app.Folder.query.filter_by(user_id=user_id).order_by(workout_app.Folder.id.desc()).first().id
+    client.post(f'/template/create/{folder_id}', data={'name': 'Push'})
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        template_id = workout_app.WorkoutTemplate.query.filter_by(folder_id=folder_id).one().id
+    for exercise_id in exercise_ids:
+        client.post(f'/template/exercise/add/{template_id}', data={'exercise_id': exercise_id, 'sets': sets, 'reps': '5'})
+    response = client.post(f'/template/{template_id}/start')
+    workout_id = int(response.headers['Location'].rstrip('/').rsplit('/', 1)[-1])
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        set_ids = [s.id for s in workout_app.WorkoutSet.query.filter_by(workout_id=workout_id).order_by(workout_app.WorkoutSet.id)]
+    return workout_id, set_ids
+
+def finish_workout(client, workout_id, set_ids, weight=100, reps=5):
+    sets = {str(set_id): {'weight': weight + i, 'reps': reps} for i, set_id in enumerate(set_ids)}
+    return client.post(f'/workout/{workout_id}/finish', json={'action': 'finish', 'sets': sets})
@@ -0,0 +1,34 @@
+import os
+
+from conftest import finish_workout, login, start_workout, workout_app
+
+def summary_sets(client):
+    return client.get('/stats/summary').json['sets']
+
+def test_snapshot_is_written_by_the_aggregates_job(client, monkeypatch):
+    user_id = login(client, 'lifter')
+    finish_workout(client, *start_workout(client, user_id, exercise_ids=(1,), sets=3))
+    assert summary_sets(client) == 3
+
+    # Queued for the worker instead of run inline: readers keep the previous snapshot
+    monkeypatch.setattr(workout_app.job_queue, 'running', True)
+    finish_workout(client, *start_workout(client, user_id, exercise_ids=(1,), sets=2))
+    assert summary_sets(client) == 3
+
+    assert workout_app.drain_jobs() == 1
+    assert summary_sets(client) == 5
+    assert os.listdir(workout_app.app.config['ANALYTICS_DIR']) == [f'user_{user_id}.npy']
+
+def test_reading_never_rebuilds_the_snapshot(client):
+    user_id = login(client, 'lifter')
+    finish_workout(client, *start_workout(client, user_id, exercise_ids=(1,), sets=3))
+    os.remove(workout_app.snapshot_path(user_id))
+
+    with workout_app.app.app_context(), workout_app.profile_sql() as profile:
+        assert summary_sets(client) == 0
+    assert not [statement for statement, _ in profile.statements if 'workout_set' in statement]
+    assert not os.path.exists(workout_app.snapshot_path(user_id))
+
+    with workout_app.app.app_context():
+        workout_app.rebuild_workout_aggregates(user_id)
+    assert summary_sets(client) == 3
@@ -0,0 +1,69 @@
+import gzip
+import json
+
+import pytest
+
+from conftest import finish_workout, login, start_workout, workout_app
+
+@pytest.fixture
+def lifter(client):
+    user_id = login(client, 'lifter')
+    workout_id, set_ids = start_workout(client, user_id, exercise_ids=(1, 2, 3, 4), sets=5)
+    finish_workout(client, workout_id, set_ids)
+    return workout_id
+
+@pytest.mark.parametrize('url', ['/api/v1/stats', '/api/v1/history', '/api/v1/workouts/{workout_id}'])
+def test_etag_revalidates_to_304(client, lifter, url):
+    url = url.format(workout_id=lifter)
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"')
+    assert response.headers['Cache-Control'] in ('private, no-cache', 'no-cache, private')
+
+    revalidated = client.get(url, headers={'If-None-Match': etag})
+
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert revalidated.headers['ETag'] == etag
+
+def test_etag_changes_with_the_data(client, lifter):
+    url = f'/api/v1/workouts/{lifter}'
+    etag = client.get(url).headers['ETag']
+    client.post(f'/history/edit/{lifter}/exercise/1/add_set')
+
+    response = client.get(url, headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_gzip_only_when_accepted(client, lifter):
+    url = f'/api/v1/workouts/{lifter}'
+    plain = client.get(url)
+    assert 'Content-Encoding' not in plain.headers
+    assert len(plain.data) >= workout_app.API_GZIP_MIN_BYTES
+
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+    # The encodings share one weak tag, so either revalidates the other
+    assert compressed.headers['ETag'] == plain.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': plain.headers['ETag'], 'Accept-Encoding': 'gzip'}).status_code == 304
+
+def test_small_bodies_are_not_compressed(client):
+    login(client, 'lifter')
+
+    response = client.get('/api/v1/history', headers={'Accept-Encoding': 'gzip'})
+
+    assert len(response.data) < workout_app.API_GZIP_MIN_BYTES
+    assert 'Content-Encoding' not in response.headers
+    assert json.loads(response.data)['next_cursor'] is None
+
+def test_other_users_workout_is_forbidden(client, lifter):
+    client.get('/logout')
+    login(client, 'partner')
+
+    assert client.get(f'/api/v1/workouts/{lifter}').status_code == 403
+    assert client.get('/api/v1/workouts/999').status_code == 404
@@ -0,0 +1,42 @@
+from conftest import finish_workout, login, start_workout, workout_app
+
+def autosave(client, *patches):
+    return client.post('/workout/sets/batch_update', json={'patches': [
+        {'set_id': set_id, 'field': field, 'value': value, 'client_seq': seq}
+        for seq, (set_id, field, value) in enumerate(patches, 1)
+    ]})
+
+def stored_set(user_id, set_id):
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        workout_set = workout_app.db.session.get(workout_app.WorkoutSet, set_id)
+        return workout_set.weight, workout_set.notes
+
+def test_batch_saves_notes_like_the_single_set_update(client):
+    user_id = login(client, 'lifter')
+    _, set_ids = start_workout(client, user_id, exercise_ids=(1,), sets=1)
+
+    response = autosave(client, (set_ids[0], 'weight', '135'), (set_ids[0], 'notes', ' Paused reps '))
+
+    assert response.status_code == 200
+    assert response.json['applied'] == set_ids
+    assert stored_set(user_id, set_ids[0]) == (135.0, 'Paused reps')
+
+def test_unknown_field_is_rejected_by_name(client):
+    user_id = login(client, 'lifter')
+    _, set_ids = start_workout(client, user_id, exercise_ids=(1,), sets=1)
+
+    response = autosave(client, (set_ids[0], 'weight', '135'), (set_ids[0], 'tempo', '3-1-1'))
+
+    assert response.status_code == 400
+    assert "'tempo'" in response.json['error']
+    assert stored_set(user_id, set_ids[0]) == (None, None)
+
+def test_batch_for_a_finished_workout_is_rejected(client):
+    user_id = login(client, 'lifter')
+    workout_id, set_ids = start_workout(client, user_id, exercise_ids=(1,), sets=1)
+    finish_workout(client, workout_id, set_ids, weight=100)
+
+    response = autosave(client, (set_ids[0], 'weight', '135'))
+
+    assert response.status_code == 409
+    assert stored_set(user_id, set_ids[0]) == (100.0, None)
@@ -0,0 +1,72 @@
+from conftest import finish_workout, login, start_workout, workout_app
+
+def row_counts(user_id):
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        return {
+            model.__tablename__: model.query.count()
+            for model in (workout_app.Folder, workout_app.WorkoutTemplate, workout_app.TemplateExercise,
+                          workout_app.Workout, workout_app.WorkoutSet)
+        }
+
+def deletes(profile, table):
+    return [statement for statement, _ in profile.statements if statement.startswith(f'DELETE FROM {table}')]
+
+def only_ids(user_id, model):
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        return [row.id for row in model.query]
+
+def test_folder_delete_cascades_to_templates_in_the_database(client):
+    user_id = login(client, 'lifter')
+    workout_id, set_ids = start_workout(client, user_id)
+    finish_workout(client, workout_id, set_ids)
+    folder_id, = only_ids(user_id, workout_app.Folder)
+
+    with workout_app.profile_sql() as profile:
+        client.post(f'/folder/{folder_id}/delete')
+
+    # One DELETE; the templates and their exercises go through ON DELETE CASCADE
+    assert len(deletes(profile, 'folder')) == 1
+    assert not deletes(profile, 'workout_template') and not deletes(profile, 'template_exercise')
+    assert row_counts(user_id) == {
+        'folder': 0, 'workout_template': 0, 'template_exercise': 0, 'workout': 1, 'workout_set': len(set_ids)
+    }
+    with workout_app.app.app_context():
+        assert workout_app.db.session.get(workout_app.Workout, workout_id).template_id is None
+
+def test_template_delete_keeps_workouts_started_from_it(client):
+    user_id = login(client, 'lifter')
+    workout_id, set_ids = start_workout(client, user_id)
+    finish_workout(client, workout_id, set_ids)
+    template_id, = only_ids(user_id, workout_app.WorkoutTemplate)
+
+    client.post(f'/template/{template_id}/delete')
+
+    assert row_counts(user_id) == {
+        'folder': 1, 'workout_template': 0, 'template_exercise': 0, 'workout': 1, 'workout_set': len(set_ids)
+    }
+    with workout_app.app.app_context():
+        assert workout_app.db.session.get(workout_app.Workout, workout_id).template_id is None
+    assert client.get(f'/history/edit/{workout_id}').status_code == 200
+
+def test_cancelled_workout_takes_its_sets_along(client):
+    user_id = login(client, 'lifter')
+    workout_id, _ = start_workout(client, user_id)
+
+    with workout_app.profile_sql() as profile:
+        client.post(f'/workout/{workout_id}/finish', data={'action': 'cancel'})
+
+    assert not deletes(profile, 'workout_set')
+    counts = row_counts(user_id)
+    assert (counts['workout'], counts['workout_set']) == (0, 0)
+
+def test_purge_removes_everything_but_the_catalog(client):
+    user_id = login(client, 'lifter')
+    finish_workout(client, *start_workout(client, user_id))
+
+    with workout_app.app.app_context():
+        user = workout_app.db.session.get(workout_app.User, user_id)
+        counts = workout_app.purge_user_data(user)
+        workout_app.db.session.commit()
+
+    assert counts['folder'] == counts['workout'] == 1
+    assert set(row_counts(user_id).values()) == {0}
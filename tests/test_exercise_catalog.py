@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from conftest import login, workout_app
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def catalog_version():
+    with workout_app.app.app_context():
+        return workout_app.db.session.get(workout_app.CatalogVersion, 1).version
+
+def catalog_names(client):
+    return {exercise['name'] for exercise in client.get('/exercises/catalog.json').json['exercises']}
+
+def test_exercise_changes_bump_the_catalog_version(client):
+    version = catalog_version()
+    with workout_app.app.app_context():
+        workout_app.db.session.add(workout_app.Exercise(name='Zercher Squat', category='Quadriceps', equipment='Barbell'))
+        workout_app.db.session.commit()
+    assert catalog_version() == version + 1
+
+    # Bulk statements skip the mapper events
+    with workout_app.app.app_context():
+        workout_app.db.session.execute(workout_app.insert(workout_app.Exercise),
+                                       [{'name': 'Jefferson Curl', 'category': 'Back'}])
+        workout_app.db.session.commit()
+    assert catalog_version() == version + 2
+
+def test_exercises_from_another_process_show_up_after_the_ttl(client, monkeypatch):
+    login(client, 'lifter')
+    monkeypatch.setitem(workout_app.app.config, 'CATALOG_VERSION_TTL', 3600)
+    catalog_names(client)
+
+    # Within the TTL the catalog is served without reading the database, the user loader aside
+    with workout_app.app.app_context(), workout_app.assert_query_budget(1):
+        assert 'Jefferson Curl' not in catalog_names(client)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as log:
+        log.write('Back day\nMonday, January 6, 2025 at 6:00 PM\n\nJefferson Curl (Barbell)\nSet 1: 60 lb x 10\n')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'import-workouts', log.name, '--username', 'lifter'],
+                   cwd=REPO_DIR, check=True, capture_output=True)
+    os.remove(log.name)
+    assert 'Jefferson Curl' not in catalog_names(client)
+
+    monkeypatch.setitem(workout_app.app.config, 'CATALOG_VERSION_TTL', 0)
+    assert 'Jefferson Curl' in catalog_names(client)
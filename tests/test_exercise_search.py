@@ -0,0 +1,40 @@
+from conftest import login, workout_app
+
+EXERCISES = [
+    {'id': 1, 'name': 'Squat', 'category': 'Quadriceps', 'equipment': 'Barbell'},
+    {'id': 2, 'name': 'Squat Jump', 'category': 'Quadriceps', 'equipment': None},
+    {'id': 3, 'name': 'Front Squat', 'category': 'Quadriceps', 'equipment': 'Barbell'},
+    {'id': 4, 'name': 'Box Squat', 'category': 'Glutes', 'equipment': 'Barbell/Box'},
+    {'id': 5, 'name': 'Bench Press', 'category': 'Chest', 'equipment': 'Barbell'},
+]
+
+def search(query, **filters):
+    index = workout_app.ExerciseSearchIndex(EXERCISES)
+    return [exercise['name'] for exercise in index.search(query, **filters)]
+
+def test_whole_name_beats_name_prefix_beats_word_match():
+    assert search('squat') == ['Squat', 'Squat Jump', 'Box Squat', 'Front Squat']
+    assert search('SQ') == ['Squat', 'Squat Jump', 'Box Squat', 'Front Squat']
+
+def test_every_query_word_must_match():
+    assert search('front squat') == ['Front Squat']
+    assert search('box jump') == []
+
+def test_typos_match_by_trigram_similarity():
+    assert search('frnt squat') == ['Front Squat']
+    assert search('xyz') == []
+
+def test_filters_and_empty_query():
+    assert search('', category='glutes') == ['Box Squat']
+    assert search('squat', equipment='box') == ['Box Squat']
+    assert search('', limit=2) == ['Bench Press', 'Box Squat']
+
+def test_endpoint_ranks_the_catalog(client):
+    login(client, 'lifter')
+
+    results = client.get('/search_exercises?q=bench+press&limit=3').json
+
+    assert len(results) == 3
+    assert results[0]['name'] == 'Bench Press'
+    assert all('bench' in result['name'].lower() for result in results)
+    assert len(client.get('/search_exercises?limit=1000').json) <= 100
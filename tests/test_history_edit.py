@@ -0,0 +1,24 @@
+from conftest import finish_workout, login, start_workout
+
+def snapshot_sets(client):
+    return client.get('/stats/summary').json['sets']
+
+def test_adding_a_set_in_history_refreshes_the_snapshot(client):
+    user_id = login(client, 'lifter')
+    workout_id, set_ids = start_workout(client, user_id, exercise_ids=(1,), sets=3)
+    finish_workout(client, workout_id, set_ids)
+    assert snapshot_sets(client) == 3
+
+    client.post(f'/history/edit/{workout_id}/exercise/1/add_set')
+
+    assert snapshot_sets(client) == 4
+
+def test_adding_an_exercise_in_history_refreshes_the_snapshot(client):
+    user_id = login(client, 'lifter')
+    workout_id, set_ids = start_workout(client, user_id, exercise_ids=(1,), sets=3)
+    finish_workout(client, workout_id, set_ids)
+    assert snapshot_sets(client) == 3
+
+    client.post(f'/history/edit/{workout_id}/exercise/add', data={'exercise_id': 2, 'sets': 2})
+
+    assert snapshot_sets(client) == 5
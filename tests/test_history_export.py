@@ -0,0 +1,67 @@
+import io
+import os
+
+from conftest import finish_workout, login, start_workout, workout_app
+
+SAMPLE_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data', 'real_workout_data.csv')
+
+def workout_count(user_id):
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        return workout_app.Workout.query.filter_by(user_id=user_id, completed=True).count()
+
+def import_log(client, text):
+    return client.post(
+        '/history/import',
+        data={'log': (io.BytesIO(text.encode()), 'workout_history.txt')},
+        content_type='multipart/form-data',
+        follow_redirects=True
+    )
+
+def test_export_is_workout_log_text(client):
+    user_id = login(client, 'lifter')
+    finish_workout(client, *start_workout(client, user_id))
+
+    response = client.get('/history/export.txt')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'workout_history.txt' in response.headers['Content-Disposition']
+    assert response.get_data(as_text=True).startswith('Push\n')
+    assert 'Set 1: 100 lb x 5' in response.get_data(as_text=True)
+
+def test_csv_url_redirects_to_the_text_export(client):
+    user_id = login(client, 'lifter')
+    finish_workout(client, *start_workout(client, user_id))
+
+    response = client.get('/history/export.csv')
+    assert response.status_code == 301
+    assert response.headers['Location'].endswith('/history/export.txt')
+
+    response = client.get('/history/export.csv', follow_redirects=True)
+    assert response.get_data(as_text=True) == client.get('/history/export.txt').get_data(as_text=True)
+
+def test_reimporting_an_export_adds_nothing(client):
+    user_id = login(client, 'lifter')
+    # Finished workouts are dated to the second, the export only to the minute
+    finish_workout(client, *start_workout(client, user_id))
+    with open(SAMPLE_LOG, encoding='utf-8-sig') as log:
+        import_log(client, log.read())
+    before = workout_count(user_id)
+    export = client.get('/history/export.txt').get_data(as_text=True)
+
+    response = import_log(client, export)
+
+    assert b'Imported 0 workouts with 0 sets' in response.data
+    assert workout_count(user_id) == before
+
+def test_export_imports_into_another_account(client):
+    user_id = login(client, 'lifter')
+    with open(SAMPLE_LOG, encoding='utf-8-sig') as log:
+        import_log(client, log.read())
+    export = client.get('/history/export.txt').get_data(as_text=True)
+    client.get('/logout')
+
+    other_id = login(client, 'partner')
+    import_log(client, export)
+
+    assert workout_count(other_id) == workout_count(user_id)
+    assert client.get('/history/export.txt').get_data(as_text=True) == export
@@ -0,0 +1,95 @@
+import io
+import os
+from datetime import datetime
+
+import pytest
+
+from conftest import login, workout_app
+
+SAMPLE_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data', 'real_workout_data.csv')
+
+PULL_DAY = """Pull
+Monday, December 9, 2024 at 6:05 AM
+
+Pull Up
+Set 1: +90 lb x 8
+Set 2: 7 reps
+
+one arm t bar row
+
+Crunch
+Set 1: 9 reps
+Set 2: 1 rep
+"""
+
+def import_log(client, text):
+    return client.post(
+        '/history/import',
+        data={'log': (io.BytesIO(text.encode()), 'workout_history.txt')},
+        content_type='multipart/form-data',
+        follow_redirects=True
+    )
+
+def imported_sets(user_id, exercise_name):
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        return workout_app.db.session.query(
+                workout_app.WorkoutSet.weight, workout_app.WorkoutSet.reps, workout_app.WorkoutSet.notes
+            )\
+            .join(workout_app.Exercise, workout_app.WorkoutSet.exercise_id == workout_app.Exercise.id)\
+            .filter(workout_app.Exercise.name == exercise_name)\
+            .order_by(workout_app.WorkoutSet.id)\
+            .all()
+
+def test_parses_bodyweight_and_added_weight_sets():
+    workouts = list(workout_app.parse_workout_log(PULL_DAY.splitlines()))
+
+    assert len(workouts) == 1
+    assert workouts[0]['name'] == 'Pull'
+    assert workouts[0]['date'] == datetime(2024, 12, 9, 6, 5)
+    assert workouts[0]['exercises'] == [
+        {'header': 'Pull Up', 'sets': [
+            {'weight': 90.0, 'reps': 8, 'notes': workout_app.ADDED_WEIGHT_NOTE},
+            {'weight': None, 'reps': 7, 'notes': None},
+        ]},
+        {'header': 'one arm t bar row', 'sets': []},
+        {'header': 'Crunch', 'sets': [
+            {'weight': None, 'reps': 9, 'notes': None},
+            {'weight': None, 'reps': 1, 'notes': None},
+        ]},
+    ]
+
+def test_set_before_any_exercise_is_rejected():
+    with pytest.raises(ValueError, match='Line 3: set listed before any exercise'):
+        list(workout_app.parse_workout_log(['Pull', 'Monday, December 9, 2024 at 6:05 AM', 'Set 1: 9 reps']))
+
+def test_sample_log_imports_bodyweight_sets(client):
+    user_id = login(client, 'lifter')
+    with open(SAMPLE_LOG, encoding='utf-8-sig') as log:
+        response = import_log(client, log.read())
+    assert b'Imported' in response.data
+
+    # "Pull Up" resolves to the catalog's Pull-Up
+    assert imported_sets(user_id, 'Pull-Up')[:3] == [
+        (90.0, 8, workout_app.ADDED_WEIGHT_NOTE),
+        (90.0, 7, workout_app.ADDED_WEIGHT_NOTE),
+        (55.0, 11, workout_app.ADDED_WEIGHT_NOTE),
+    ]
+    assert imported_sets(user_id, 'Crunch')[:3] == [(None, 9, None), (None, 8, None), (None, 14, None)]
+
+def test_bodyweight_sets_export_as_written(client):
+    login(client, 'lifter')
+    import_log(client, PULL_DAY)
+
+    export = client.get('/history/export.txt').get_data(as_text=True)
+
+    assert 'Set 1: +90 lb x 8\nSet 2: 7 reps\n' in export
+    assert 'Crunch (Bodyweight)\nSet 1: 9 reps\n' in export
+
+def test_malformed_upload_is_reported(client):
+    user_id = login(client, 'lifter')
+
+    response = import_log(client, 'Set 1: 100 lb x 5\n')
+
+    assert b'Import stopped: Line 1: set listed before any exercise.' in response.data
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        assert workout_app.Workout.query.filter_by(user_id=user_id).count() == 0
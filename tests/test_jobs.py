@@ -0,0 +1,42 @@
+from conftest import finish_workout, login, start_workout, workout_app
+
+def stats_exercise_ids(client):
+    return [exercise['id'] for exercise in client.get('/api/v1/stats').json['exercises']]
+
+def test_same_workout_id_on_two_shards_gets_a_job_each(sharded, monkeypatch):
+    # Queue the aggregates as the worker pool would instead of running them inline
+    monkeypatch.setattr(workout_app.job_queue, 'running', True)
+    lifters = []
+    for username, exercise_id in (('alice', 1), ('bob', 2)):
+        client = workout_app.app.test_client()
+        user_id = login(client, username)
+        workout_id, set_ids = start_workout(client, user_id, exercise_ids=(exercise_id,))
+        finish_workout(client, workout_id, set_ids)
+        lifters.append((client, user_id, workout_id, exercise_id))
+    # Each user's first workout on their own shard
+    assert lifters[0][2] == lifters[1][2]
+
+    with workout_app.app.app_context():
+        jobs = {job.key: job.user_id for job in workout_app.Job.query}
+        assert jobs == {
+            f'workout_aggregates:{user_id}:{workout_id}': user_id
+            for _, user_id, workout_id, _ in lifters
+        }
+        assert workout_app.drain_jobs() == 2
+
+    for client, _, _, exercise_id in lifters:
+        assert stats_exercise_ids(client) == [exercise_id]
+
+def test_reenqueueing_a_pending_job_keeps_one_row(monkeypatch):
+    monkeypatch.setattr(workout_app.job_queue, 'running', True)
+    calls = []
+    monkeypatch.setitem(workout_app.job_handlers, 'record', calls.append)
+
+    with workout_app.app.app_context():
+        workout_app.enqueue_job('record', 'record:1', {'value': 1})
+        workout_app.enqueue_job('record', 'record:1', {'value': 2})
+        workout_app.db.session.commit()
+        assert workout_app.Job.query.count() == 1
+        assert workout_app.drain_jobs() == 1
+
+    assert calls == [{'value': 2}]
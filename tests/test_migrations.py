@@ -0,0 +1,156 @@
+import sqlite3
+
+import migrations
+from conftest import workout_app
+
+# Schema db.create_all() built before the migration runner existed
+BASELINE_SCHEMA = '''
+CREATE TABLE user (
+    id INTEGER NOT NULL, username VARCHAR(80) NOT NULL, email VARCHAR(120) NOT NULL, password_hash VARCHAR(128),
+    PRIMARY KEY (id), UNIQUE (username), UNIQUE (email)
+);
+CREATE TABLE exercise (
+    id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, category VARCHAR(50) NOT NULL, equipment VARCHAR(50),
+    PRIMARY KEY (id)
+);
+CREATE TABLE folder (
+    id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, user_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE workout_template (
+    id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, folder_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(folder_id) REFERENCES folder (id)
+);
+CREATE TABLE template_exercise (
+    id INTEGER NOT NULL, template_id INTEGER NOT NULL, exercise_id INTEGER NOT NULL, sets INTEGER NOT NULL,
+    reps VARCHAR(50), weight FLOAT, rpe FLOAT, rir INTEGER, notes VARCHAR(200),
+    PRIMARY KEY (id),
+    FOREIGN KEY(template_id) REFERENCES workout_template (id),
+    FOREIGN KEY(exercise_id) REFERENCES exercise (id)
+);
+CREATE TABLE workout (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, template_id INTEGER, date DATETIME NOT NULL,
+    name VARCHAR(100), notes VARCHAR(500), completed BOOLEAN, end_time DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id),
+    FOREIGN KEY(template_id) REFERENCES workout_template (id)
+);
+CREATE TABLE workout_set (
+    id INTEGER NOT NULL, workout_id INTEGER NOT NULL, exercise_id INTEGER NOT NULL,
+    weight FLOAT, reps INTEGER, rpe FLOAT, rir INTEGER, notes VARCHAR(200), completed BOOLEAN,
+    PRIMARY KEY (id),
+    FOREIGN KEY(workout_id) REFERENCES workout (id),
+    FOREIGN KEY(exercise_id) REFERENCES exercise (id)
+);
+INSERT INTO user VALUES (1, 'lifter', 'lifter@example.com', NULL);
+INSERT INTO exercise VALUES (1, 'Bench Press', 'Chest', 'Barbell');
+INSERT INTO folder VALUES (1, 'Program', 1);
+INSERT INTO workout_template VALUES (1, 'Push', 1);
+INSERT INTO template_exercise VALUES (1, 1, 1, 3, '5', NULL, NULL, NULL, NULL);
+INSERT INTO workout VALUES (1, 1, 1, '2024-12-08 15:46:00.000000', 'Push', NULL, 1, '2024-12-08 16:46:00.000000');
+INSERT INTO workout_set VALUES (1, 1, 1, 225, 5, 8, NULL, NULL, 1);
+'''
+
+def baseline_database(tmp_path):
+    path = str(tmp_path / 'workouts.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.close()
+    return path
+
+def test_upgrade_brings_a_baseline_database_to_the_model_schema(tmp_path):
+    path = baseline_database(tmp_path)
+
+    applied = migrations.upgrade(path)
+
+    assert applied == [revision for revision, _, _ in migrations.MIGRATIONS]
+    conn = sqlite3.connect(path)
+    for table in workout_app.db.metadata.sorted_tables:
+        if not migrations._has_table(conn, table.name):
+            continue  # Tables added since are created by db.create_all()
+        assert migrations._columns(conn, table.name) == {column.name for column in table.columns}, table.name
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table.name,))}
+        assert {index.name for index in table.indexes} <= indexes, table.name
+
+def test_upgrade_backfills_and_keeps_existing_rows(tmp_path):
+    path = baseline_database(tmp_path)
+
+    migrations.upgrade(path)
+
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT start_time, duration FROM workout').fetchone() == ('2024-12-08 15:46:00.000000', 3600)
+    assert conn.execute('SELECT weight, reps, rpe FROM workout_set').fetchone() == (225, 5, 8)
+    assert conn.execute('SELECT data_version, completed_workouts FROM user').fetchone() == (0, None)
+    assert len(conn.execute('SELECT revision FROM workout_template').fetchone()[0]) == 32
+
+def test_upgrade_runs_each_migration_once(tmp_path):
+    path = baseline_database(tmp_path)
+    migrations.upgrade(path)
+
+    assert migrations.upgrade(path) == []
+    assert all(is_applied for _, _, is_applied in migrations.status(path))
+
+def test_cascading_deletes_rewrite_the_foreign_keys(tmp_path):
+    path = baseline_database(tmp_path)
+    conn = sqlite3.connect(path)
+    # Left behind by the old multi-statement deletes
+    conn.execute("INSERT INTO workout_set VALUES (2, 99, 1, 100, 5, NULL, NULL, NULL, 1)")
+    conn.commit()
+    conn.close()
+
+    migrations.upgrade(path)
+
+    conn = sqlite3.connect(path)
+    foreign_keys = {
+        (table, row[3]): row[6]
+        for table in ('workout_template', 'template_exercise', 'workout', 'workout_set')
+        for row in conn.execute(f'PRAGMA foreign_key_list("{table}")')
+    }
+    assert foreign_keys == {
+        ('workout_template', 'folder_id'): 'CASCADE',
+        ('template_exercise', 'template_id'): 'CASCADE',
+        ('template_exercise', 'exercise_id'): 'NO ACTION',
+        ('workout', 'template_id'): 'SET NULL',
+        ('workout', 'user_id'): 'NO ACTION',
+        ('workout_set', 'workout_id'): 'CASCADE',
+        ('workout_set', 'exercise_id'): 'NO ACTION',
+    }
+    assert conn.execute('SELECT id FROM workout_set').fetchall() == [(1,)]
+    assert 'ix_workout_set_workout_exercise' in {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'workout_set'")
+    }
+
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.execute('DELETE FROM folder')
+    assert conn.execute('SELECT count(*) FROM workout_template').fetchone() == (0,)
+    assert conn.execute('SELECT count(*) FROM template_exercise').fetchone() == (0,)
+    assert conn.execute('SELECT template_id FROM workout').fetchall() == [(None,)]
+    conn.execute('DELETE FROM workout')
+    assert conn.execute('SELECT count(*) FROM workout_set').fetchone() == (0,)
+
+def test_rebuild_replaces_an_existing_action_and_keeps_quoted_names():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE parent (id INTEGER PRIMARY KEY)')
+    conn.execute('''
+        CREATE TABLE "child" (
+            id INTEGER PRIMARY KEY, "parent_id" INTEGER, other_id INTEGER,
+            FOREIGN KEY ( "parent_id" ) REFERENCES "parent" (id) on delete restrict,
+            FOREIGN KEY(other_id) REFERENCES parent (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX ix_child_parent ON child (parent_id)')
+    conn.execute('INSERT INTO parent VALUES (1)')
+    conn.execute('INSERT INTO child VALUES (1, 1, 1)')
+
+    migrations._rebuild_with_on_delete(conn, 'child', {'parent_id': 'CASCADE'})
+
+    actions = {row[3]: row[6] for row in conn.execute('PRAGMA foreign_key_list(child)')}
+    assert actions == {'parent_id': 'CASCADE', 'other_id': 'NO ACTION'}
+    assert conn.execute('SELECT * FROM child').fetchall() == [(1, 1, 1)]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall() == [('ix_child_parent',)]
+
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'child'").fetchone()[0]
+    migrations._rebuild_with_on_delete(conn, 'child', {'parent_id': 'CASCADE'})
+    assert conn.execute("SELECT sql FROM sqlite_master WHERE name = 'child'").fetchone()[0] == sql
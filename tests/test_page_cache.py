@@ -0,0 +1,66 @@
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import finish_workout, login, start_workout, workout_app
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_LOG = os.path.join(REPO_DIR, 'Data', 'real_workout_data.csv')
+
+@pytest.fixture(autouse=True)
+def page_cache(monkeypatch):
+    cache = workout_app.PageCache(16 * 1024 * 1024)
+    monkeypatch.setattr(workout_app, 'page_cache', cache)
+    return cache
+
+def read_flashes(client):
+    # Pages with pending flashed messages bypass the cache
+    client.get('/dashboard')
+
+def test_cached_page_is_served_until_the_user_writes(client):
+    user_id = login(client, 'lifter')
+    read_flashes(client)
+    assert client.get('/history').headers['X-Page-Cache'] == 'miss'
+    assert client.get('/history').headers['X-Page-Cache'] == 'hit'
+
+    finish_workout(client, *start_workout(client, user_id))
+    read_flashes(client)
+
+    response = client.get('/history')
+    assert response.headers['X-Page-Cache'] == 'miss'
+    assert b'Push' in response.data
+
+def test_import_with_several_commits_succeeds(client):
+    user_id = login(client, 'lifter')
+    read_flashes(client)
+    client.get('/history')
+
+    # Chunks and the aggregate rebuild each commit within the one request
+    with open(SAMPLE_LOG, 'rb') as log:
+        response = client.post('/history/import', data={'log': (io.BytesIO(log.read()), 'log.txt')},
+                               content_type='multipart/form-data')
+
+    assert response.status_code == 302
+    with workout_app.app.app_context():
+        assert workout_app.Workout.query.filter_by(user_id=user_id).count() == 4
+    read_flashes(client)
+    assert client.get('/history').headers['X-Page-Cache'] == 'miss'
+
+def test_writes_from_another_process_invalidate_pages(client, monkeypatch):
+    user_id = login(client, 'lifter')
+    # Leave the workout's aggregates queued for `flask jobs drain` instead of running them inline
+    monkeypatch.setattr(workout_app.job_queue, 'running', True)
+    finish_workout(client, *start_workout(client, user_id, exercise_ids=(1,)))
+    read_flashes(client)
+    assert b'chart_1' not in client.get('/stats').data
+    assert client.get('/stats').headers['X-Page-Cache'] == 'hit'
+
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'jobs', 'drain'],
+                   cwd=REPO_DIR, check=True, capture_output=True)
+
+    response = client.get('/stats')
+    assert response.headers['X-Page-Cache'] == 'miss'
+    assert b'chart_1' in response.data
@@ -0,0 +1,48 @@
+from conftest import finish_workout, login, start_workout, workout_app
+
+def autosave(client, set_ids, weight=100, reps=5):
+    patches = []
+    for seq, set_id in enumerate(set_ids, 1):
+        patches.append({'set_id': set_id, 'field': 'weight', 'value': weight + seq, 'client_seq': seq})
+        patches.append({'set_id': set_id, 'field': 'reps', 'value': reps, 'client_seq': seq})
+    return client.post('/workout/sets/batch_update', json={'patches': patches})
+
+def stored_records(user_id):
+    with workout_app.app.app_context():
+        return workout_app.PersonalRecord.query.filter_by(user_id=user_id).count()
+
+def data_version(user_id):
+    with workout_app.app.app_context():
+        return workout_app.db.session.get(workout_app.User, user_id).data_version
+
+def test_workout_page_flags_records_without_writing(client):
+    user_id = login(client, 'lifter')
+    workout_id, set_ids = start_workout(client, user_id, exercise_ids=(1,), sets=3)
+    assert autosave(client, set_ids).json['records'][str(set_ids[-1])] == ['e1RM', 'Weight', 'Reps']
+    client.get(f'/workout/{workout_id}')  # Shows the flashed messages
+    stored_page = client.get(f'/workout/{workout_id}').data
+
+    # As for history logged before the table existed
+    with workout_app.app.app_context():
+        workout_app.PersonalRecord.query.delete()
+        workout_app.db.session.commit()
+    version = data_version(user_id)
+
+    response = client.get(f'/workout/{workout_id}')
+
+    assert b'PR: e1RM, Weight, Reps' in response.data
+    assert response.data == stored_page
+    assert stored_records(user_id) == 0
+    assert data_version(user_id) == version
+
+def test_deleting_an_exercise_from_history_drops_its_record(client):
+    user_id = login(client, 'lifter')
+    workout_id, set_ids = start_workout(client, user_id, exercise_ids=(1, 2), sets=2)
+    finish_workout(client, workout_id, set_ids)
+    assert stored_records(user_id) == 2
+
+    client.post(f'/history/edit/{workout_id}/exercise/2/delete')
+
+    with workout_app.app.app_context():
+        assert [record.exercise_id for record in workout_app.PersonalRecord.query] == [1]
+        assert workout_app.rebuild_personal_records(user_id) == 1
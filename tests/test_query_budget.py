@@ -0,0 +1,47 @@
+import pytest
+
+from conftest import finish_workout, login, start_workout, workout_app
+
+# Statements each page may run, the user row load included. The fixture gives
+# the user several folders, workouts and exercises, so a lazy load per row
+# would go over budget.
+PAGE_BUDGETS = [
+    ('/profile', 1),
+    ('/dashboard', 5),
+    ('/workout/{live_workout_id}', 5),
+    ('/history/edit/{finished_workout_id}', 4),
+    ('/history', 3),
+    ('/stats', 2),
+]
+
+@pytest.fixture
+def workouts(client, monkeypatch):
+    # Keep the catalog version check from coming due in the middle of a measured page
+    monkeypatch.setitem(workout_app.app.config, 'CATALOG_VERSION_TTL', 3600)
+    user_id = login(client, 'lifter')
+    for _ in range(3):
+        workout_id, set_ids = start_workout(client, user_id, exercise_ids=(1, 2, 3, 4), sets=4)
+        finish_workout(client, workout_id, set_ids)
+    live_workout_id, _ = start_workout(client, user_id, exercise_ids=(1, 2, 3, 4), sets=4)
+    # Render the pending flashed messages now rather than on the measured page
+    client.get('/dashboard')
+    # The in-process exercise catalog is read once per change, not per request
+    client.get('/exercises/catalog.json')
+    return {'live_workout_id': live_workout_id, 'finished_workout_id': workout_id}
+
+@pytest.mark.parametrize('path, budget', PAGE_BUDGETS)
+def test_page_stays_within_query_budget(client, workouts, path, budget):
+    with workout_app.app.app_context(), workout_app.assert_query_budget(budget):
+        response = client.get(path.format(**workouts))
+    assert response.status_code == 200
+
+def test_profile_just_after_a_finish_runs_only_the_user_loader(client, workouts, monkeypatch):
+    # Finishing refreshes the counters, rollups and snapshot; none of it is left for the landing page
+    client.post(f"/workout/{workouts['live_workout_id']}/finish", json={'action': 'finish', 'sets': {}})
+    # Nor is the exercise catalog, even with its version check due on every request
+    monkeypatch.setitem(workout_app.app.config, 'CATALOG_VERSION_TTL', 0)
+
+    with workout_app.app.app_context(), workout_app.assert_query_budget(1):
+        response = client.get('/profile')
+    assert response.status_code == 200
+    assert b'You have completed 4 workouts so far.' in response.data
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+
+import pytest
+
+from conftest import finish_workout, login, start_workout, workout_app
+
+def table_rows(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0]
+    finally:
+        conn.close()
+
+def shard_tables(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+
+def catalog_path():
+    with workout_app.app.app_context():
+        return workout_app.db.engine.url.database
+
+def test_each_user_writes_to_their_own_shard(sharded):
+    user_ids = []
+    for username in ('alice', 'bob'):
+        client = workout_app.app.test_client()
+        user_id = login(client, username)
+        finish_workout(client, *start_workout(client, user_id, exercise_ids=(1,), sets=2))
+        user_ids.append(user_id)
+
+    for user_id in user_ids:
+        path = os.path.join(sharded.shard_dir, f'user_{user_id}.db')
+        assert table_rows(path, 'workout') == 1
+        assert table_rows(path, 'workout_set') == 2
+        # Users and exercises stay in the catalog database
+        assert not shard_tables(path) & {'user', 'exercise', 'job', 'catalog_version'}
+    assert table_rows(catalog_path(), 'workout') == 0
+
+def test_shard_queries_join_the_attached_catalog(sharded, client):
+    user_id = login(client, 'lifter')
+    finish_workout(client, *start_workout(client, user_id, exercise_ids=(1, 2), sets=1))
+
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        rows = workout_app.db.session.query(workout_app.WorkoutSet.id, workout_app.Exercise.name)\
+            .join(workout_app.Exercise, workout_app.WorkoutSet.exercise_id == workout_app.Exercise.id)\
+            .order_by(workout_app.WorkoutSet.id)\
+            .all()
+    assert [name for _, name in rows] == ['Bench Press', 'Incline Dumbbell Press']
+    # Pages joining sets to exercises and users render from the shard
+    assert b'Bench Press' in client.get('/stats').data
+
+def test_hash_partitioned_users_share_a_shard_but_not_data(monkeypatch):
+    router = workout_app.ShardRouter('2', os.environ['SHARD_DIR'])
+    monkeypatch.setattr(workout_app, 'shard_router', router)
+    clients = {}
+    for username in ('alice', 'bob', 'carol'):
+        client = workout_app.app.test_client()
+        clients[username] = (client, login(client, username))
+    (alice, alice_id), (carol, carol_id) = clients['alice'], clients['carol']
+    shared = router.shard_key(alice_id)
+    assert router.shard_key(carol_id) == shared == f'shard_{alice_id % 2}'
+    assert router.shard_key(clients['bob'][1]) != shared
+
+    finish_workout(alice, *start_workout(alice, alice_id, exercise_ids=(1,)))
+
+    assert table_rows(os.path.join(router.shard_dir, f'{shared}.db'), 'workout') == 1
+    assert b'Push' in alice.get('/history').data
+    assert b'Push' not in carol.get('/history').data
+    for engine in router._engines.values():
+        engine.dispose()
+
+def test_router_only_routes_per_user_tables(sharded):
+    assert sharded.routes(workout_app.WorkoutSet, None)
+    assert not sharded.routes(workout_app.User, None)
+    assert not sharded.routes(workout_app.Exercise, None)
+    assert sharded.routes(None, workout_app.select(workout_app.WorkoutSet.id).join(workout_app.Exercise))
+    with workout_app.app.app_context(), pytest.raises(RuntimeError):
+        sharded.current_user_id()
@@ -0,0 +1,83 @@
+import io
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from conftest import login, workout_app
+
+FIRST_DAY = datetime(2024, 1, 1, 6, 0)
+SPIKE_DAY = 37
+
+def bench_log(days):
+    """A daily Bench Press workout, slowly progressing, with one outlier day."""
+    lines = []
+    for day in range(days):
+        weight = 300 if day == SPIKE_DAY else 100 + day
+        lines += ['Push', workout_app.format_workout_log_date(FIRST_DAY + timedelta(days=day)), '',
+                  'Bench Press (Barbell)', f'Set 1: {weight} lb x 5', '']
+    return '\n'.join(lines)
+
+def import_bench(client, days=60):
+    login(client, 'lifter')
+    client.post(
+        '/history/import',
+        data={'log': (io.BytesIO(bench_log(days).encode()), 'workout_history.txt')},
+        content_type='multipart/form-data'
+    )
+    with workout_app.app.app_context():
+        return workout_app.Exercise.query.filter_by(name='Bench Press').one().id
+
+def day(offset):
+    return (FIRST_DAY + timedelta(days=offset)).strftime('%Y-%m-%d')
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    x = np.arange(100, dtype=np.float64)
+    y = np.zeros(100)
+    y[41] = 50
+    y[77] = -50
+
+    keep = workout_app.lttb_indices(x, y, 10)
+
+    assert len(keep) == 10
+    assert keep[0] == 0 and keep[-1] == 99
+    assert np.all(np.diff(keep) > 0)
+    assert {41, 77} <= set(keep.tolist())
+
+def test_lttb_returns_short_series_whole():
+    x = np.arange(5, dtype=np.float64)
+
+    assert workout_app.lttb_indices(x, x, 5).tolist() == [0, 1, 2, 3, 4]
+    assert workout_app.lttb_indices(x, x, 2).tolist() == [0, 1, 2, 3, 4]
+
+def test_series_is_downsampled_to_points(client):
+    exercise_id = import_bench(client)
+
+    series = client.get(f'/api/v1/stats/{exercise_id}?points=10').get_json()
+
+    assert series['total_points'] == 60
+    assert series['name'] == 'Bench Press'
+    assert len(series['dates']) == len(series['e1rm']) == len(series['weight']) == 10
+    assert series['dates'][0] == day(0) and series['dates'][-1] == day(59)
+    assert series['dates'][series['weight'].index(300)] == day(SPIKE_DAY)
+
+def test_series_window_is_end_exclusive(client):
+    exercise_id = import_bench(client)
+
+    series = client.get(f'/api/v1/stats/{exercise_id}?start={day(10)}&end={day(20)}').get_json()
+
+    assert series['total_points'] == 10
+    assert series['dates'] == [day(offset) for offset in range(10, 20)]
+    assert series['weight'] == [100.0 + offset for offset in range(10, 20)]
+
+def test_points_are_clamped(client):
+    exercise_id = import_bench(client)
+
+    assert len(client.get(f'/api/v1/stats/{exercise_id}?points=1').get_json()['dates']) == 3
+    assert len(client.get(f'/api/v1/stats/{exercise_id}').get_json()['dates']) == 60
+
+def test_bad_requests(client):
+    exercise_id = import_bench(client, days=3)
+
+    assert client.get(f'/api/v1/stats/{exercise_id}?start=01/02/2024').status_code == 400
+    assert client.get('/api/v1/stats/99999').status_code == 404
+    assert client.get(f'/api/v1/stats/{exercise_id}?start=2030-01-01').get_json()['dates'] == []
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+from conftest import login, start_workout, workout_app
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def workout_exercises(user_id, workout_id):
+    with workout_app.app.app_context(), workout_app.shard_router.using(user_id):
+        return sorted({s.exercise_id for s in workout_app.WorkoutSet.query.filter_by(workout_id=workout_id)})
+
+def test_editing_a_template_changes_the_next_start(client):
+    user_id = login(client, 'lifter')
+    workout_id, _ = start_workout(client, user_id, exercise_ids=(1,))
+    assert workout_exercises(user_id, workout_id) == [1]
+    with workout_app.app.app_context():
+        template_id = workout_app.db.session.get(workout_app.Workout, workout_id).template_id
+
+    client.post(f'/template/exercise/add/{template_id}', data={'exercise_id': 2, 'sets': 2, 'reps': '8-12'})
+    response = client.post(f'/template/{template_id}/start')
+
+    workout_id = int(response.headers['Location'].rsplit('/', 1)[-1])
+    assert workout_exercises(user_id, workout_id) == [1, 2]
+
+def test_reused_template_id_does_not_start_from_a_cached_plan(client):
+    user_id = login(client, 'lifter')
+    workout_id, _ = start_workout(client, user_id, exercise_ids=(1,))
+    with workout_app.app.app_context():
+        template_id = workout_app.db.session.get(workout_app.Workout, workout_id).template_id
+
+    # Deleted and recreated by other processes, so this one's plan cache hears of neither
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'purge-user', 'lifter', '--keep-account', '--yes'],
+                   cwd=REPO_DIR, check=True, capture_output=True)
+    with workout_app.app.app_context():
+        folder = workout_app.Folder(name='Folder', user_id=user_id)
+        template = workout_app.WorkoutTemplate(name='Pull', folder=folder)
+        template.exercises.append(workout_app.TemplateExercise(exercise_id=2, sets=2, reps='5'))
+        workout_app.db.session.add(folder)
+        workout_app.db.session.commit()
+        assert template.id == template_id
+
+    response = client.post(f'/template/{template_id}/start')
+
+    workout_id = int(response.headers['Location'].rsplit('/', 1)[-1])
+    assert workout_exercises(user_id, workout_id) == [2]
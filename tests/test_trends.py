@@ -0,0 +1,26 @@
+from conftest import login, start_workout
+
+def finish_with_effort(client, workout_id, set_ids, efforts):
+    sets = {
+        str(set_id): {'weight': 100, 'reps': 5, 'rpe': rpe, 'rir': rir}
+        for set_id, (rpe, rir) in zip(set_ids, efforts)
+    }
+    return client.post(f'/workout/{workout_id}/finish', json={'action': 'finish', 'sets': sets})
+
+def test_hard_sets_need_rpe_or_rir_in_range(client):
+    user_id = login(client, 'lifter')
+    workout_id, set_ids = start_workout(client, user_id, exercise_ids=(1,), sets=5)
+
+    finish_with_effort(client, workout_id, set_ids, [
+        (8, 4),         # RPE alone qualifies
+        (6, 2),         # RIR alone qualifies
+        (6, 4),         # neither qualifies
+        (None, 5),      # only RIR logged, out of range
+        ('', ''),       # neither logged, counted as hard
+    ])
+
+    trends = client.get('/trends?weeks=1').json
+    assert trends['sets'] == [5]
+    assert trends['hard_sets'] == [3]
+    assert trends['tonnage'] == [2500.0]
+    assert trends['categories']['Chest']['hard_sets'] == [3]